@@ -0,0 +1,32 @@
+"""Add post keyset pagination indexes
+
+Revision ID: 3f8a1c2d9b7e
+Revises: e496525443cd
+Create Date: 2026-10-18 09:12:31.402115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '3f8a1c2d9b7e'
+down_revision: Union[str, Sequence[str], None] = 'e496525443cd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 表可能已由 Base.metadata.create_all 建好，因此使用 IF NOT EXISTS
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'], unique=False, if_not_exists=True)
+    op.create_index(
+        'ix_posts_author_id_created_at_id', 'posts', ['author_id', 'created_at', 'id'], unique=False, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_author_id_created_at_id', table_name='posts', if_exists=True)
+    op.drop_index('ix_posts_created_at_id', table_name='posts', if_exists=True)
@@ -0,0 +1,49 @@
+"""Add denormalized comment stats to posts
+
+Revision ID: 5d2e8a7c4b1f
+Revises: 7c4e2b9f1a3d
+Create Date: 2026-10-18 15:42:09.381264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '5d2e8a7c4b1f'
+down_revision: Union[str, Sequence[str], None] = '7c4e2b9f1a3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 表可能已由 Base.metadata.create_all 建好，先检查列是否存在
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('posts')}
+    if 'comment_count' not in columns:
+        op.add_column('posts', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    if 'last_commented_at' not in columns:
+        op.add_column('posts', sa.Column('last_commented_at', sa.DateTime(timezone=True), nullable=True))
+
+    # 按现有评论回填统计
+    op.execute(
+        """
+        UPDATE posts SET
+            comment_count = stats.comment_count,
+            last_commented_at = stats.last_commented_at
+        FROM (
+            SELECT post_id, count(*) AS comment_count, max(created_at) AS last_commented_at
+            FROM comments
+            WHERE is_active
+            GROUP BY post_id
+        ) AS stats
+        WHERE posts.id = stats.post_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'last_commented_at')
+    op.drop_column('posts', 'comment_count')
@@ -0,0 +1,46 @@
+"""Add post full-text search vector
+
+Revision ID: 7c4e2b9f1a3d
+Revises: 3f8a1c2d9b7e
+Create Date: 2026-10-18 11:03:47.215930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '7c4e2b9f1a3d'
+down_revision: Union[str, Sequence[str], None] = '3f8a1c2d9b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 与 app.models.post.SEARCH_VECTOR_SQL 保持一致；迁移中固定表达式，避免随模型变化
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(summary, '')), 'B') || "
+    "setweight(to_tsvector('simple'::regconfig, coalesce(content, '')), 'C')"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 表可能已由 Base.metadata.create_all 建好，先检查列是否存在
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('posts')}
+    if 'search_vector' not in columns:
+        # 生成列会为已有文章回填检索向量，并在之后每次写入时自动维护
+        op.add_column(
+            'posts',
+            sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_SQL, persisted=True)),
+        )
+    op.create_index(
+        'ix_posts_search_vector', 'posts', ['search_vector'], unique=False, postgresql_using='gin', if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_search_vector', table_name='posts', postgresql_using='gin', if_exists=True)
+    op.drop_column('posts', 'search_vector')
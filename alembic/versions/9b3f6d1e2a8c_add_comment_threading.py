@@ -0,0 +1,40 @@
+"""Add comment threading
+
+Revision ID: 9b3f6d1e2a8c
+Revises: 5d2e8a7c4b1f
+Create Date: 2026-10-18 16:27:51.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '9b3f6d1e2a8c'
+down_revision: Union[str, Sequence[str], None] = '5d2e8a7c4b1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 表可能已由 Base.metadata.create_all 建好，先检查列是否存在
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('comments')}
+    if 'parent_id' not in columns:
+        op.add_column('comments', sa.Column('parent_id', sa.Integer(), nullable=True))
+        op.create_foreign_key(
+            'comments_parent_id_fkey', 'comments', 'comments', ['parent_id'], ['id'], ondelete='CASCADE'
+        )
+    op.create_index(
+        'ix_comments_post_id_created_at_id', 'comments', ['post_id', 'created_at', 'id'], unique=False, if_not_exists=True
+    )
+    op.create_index('ix_comments_parent_id', 'comments', ['parent_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_comments_parent_id', table_name='comments', if_exists=True)
+    op.drop_index('ix_comments_post_id_created_at_id', table_name='comments', if_exists=True)
+    op.drop_constraint('comments_parent_id_fkey', 'comments', type_='foreignkey')
+    op.drop_column('comments', 'parent_id')
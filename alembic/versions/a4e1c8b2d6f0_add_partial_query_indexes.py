@@ -0,0 +1,66 @@
+"""Add partial and composite indexes for hot queries
+
+Revision ID: a4e1c8b2d6f0
+Revises: 9b3f6d1e2a8c
+Create Date: 2026-10-18 17:05:22.718344
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'a4e1c8b2d6f0'
+down_revision: Union[str, Sequence[str], None] = '9b3f6d1e2a8c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 表可能已由 Base.metadata.create_all 建好，因此使用 IF NOT EXISTS
+    # 公开文章列表只扫描已发布文章，取代不区分发布状态的索引
+    op.create_index(
+        'ix_posts_published_created_at_id',
+        'posts',
+        ['created_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text('is_published'),
+        if_not_exists=True,
+    )
+    op.drop_index('ix_posts_created_at_id', table_name='posts', if_exists=True)
+
+    # 顶层评论分页与评论统计只涉及有效评论
+    op.create_index(
+        'ix_comments_post_id_threads',
+        'comments',
+        ['post_id', 'created_at', 'id'],
+        unique=False,
+        postgresql_where=sa.text('parent_id IS NULL AND is_active'),
+        if_not_exists=True,
+    )
+    op.create_index(
+        'ix_comments_active_post_id_created_at',
+        'comments',
+        ['post_id', 'created_at'],
+        unique=False,
+        postgresql_where=sa.text('is_active'),
+        if_not_exists=True,
+    )
+    op.drop_index('ix_comments_post_id_created_at_id', table_name='comments', if_exists=True)
+
+    # 按标签筛选文章
+    op.create_index('ix_post_tags_tag_id_post_id', 'post_tags', ['tag_id', 'post_id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_tags_tag_id_post_id', table_name='post_tags', if_exists=True)
+    op.create_index(
+        'ix_comments_post_id_created_at_id', 'comments', ['post_id', 'created_at', 'id'], unique=False, if_not_exists=True
+    )
+    op.drop_index('ix_comments_active_post_id_created_at', table_name='comments', if_exists=True)
+    op.drop_index('ix_comments_post_id_threads', table_name='comments', if_exists=True)
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'], unique=False, if_not_exists=True)
+    op.drop_index('ix_posts_published_created_at_id', table_name='posts', if_exists=True)
@@ -0,0 +1,44 @@
+"""Add denormalized post count to tags
+
+Revision ID: c2f5a9d3e7b4
+Revises: a4e1c8b2d6f0
+Create Date: 2026-10-18 18:21:36.049712
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'c2f5a9d3e7b4'
+down_revision: Union[str, Sequence[str], None] = 'a4e1c8b2d6f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # 表可能已由 Base.metadata.create_all 建好，先检查列是否存在
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('tags')}
+    if 'post_count' not in columns:
+        op.add_column('tags', sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+
+    # 按现有已发布文章回填计数
+    op.execute(
+        """
+        UPDATE tags SET post_count = stats.post_count
+        FROM (
+            SELECT post_tags.tag_id, count(*) AS post_count
+            FROM post_tags JOIN posts ON posts.id = post_tags.post_id
+            WHERE posts.is_published
+            GROUP BY post_tags.tag_id
+        ) AS stats
+        WHERE tags.id = stats.tag_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tags', 'post_count')
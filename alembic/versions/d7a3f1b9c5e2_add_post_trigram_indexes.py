@@ -0,0 +1,42 @@
+"""Add trigram indexes for CJK post search
+
+Revision ID: d7a3f1b9c5e2
+Revises: c2f5a9d3e7b4
+Create Date: 2026-10-18 21:14:52.683104
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'd7a3f1b9c5e2'
+down_revision: Union[str, Sequence[str], None] = 'c2f5a9d3e7b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 含中日韩文字的检索按子串匹配（ILIKE），simple 检索配置无法切分连续的汉字
+TRIGRAM_COLUMNS = ('title', 'summary', 'content')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # 表可能已由 Base.metadata.create_all 建好，因此使用 IF NOT EXISTS
+    for column in TRIGRAM_COLUMNS:
+        op.create_index(
+            f'ix_posts_{column}_trgm',
+            'posts',
+            [column],
+            unique=False,
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in TRIGRAM_COLUMNS:
+        op.drop_index(f'ix_posts_{column}_trgm', table_name='posts', postgresql_using='gin', if_exists=True)
@@ -0,0 +1,45 @@
+"""Cascade comment deletes from posts and parent comments
+
+Revision ID: f3b8e2a6c1d9
+Revises: d7a3f1b9c5e2
+Create Date: 2026-10-18 22:05:17.392841
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'f3b8e2a6c1d9'
+down_revision: Union[str, Sequence[str], None] = 'd7a3f1b9c5e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (约束名, 本表列, 被引用表)；删除文章时由数据库删除其评论，回复随上级评论一并删除
+FOREIGN_KEYS = (
+    ('comments_post_id_fkey', 'post_id', 'posts'),
+    ('comments_parent_id_fkey', 'parent_id', 'comments'),
+)
+
+
+def _recreate_foreign_keys(ondelete) -> None:
+    # 表可能由 Base.metadata.create_all 建好，约束名按实际存在的外键查找
+    existing = {
+        tuple(fk['constrained_columns']): fk['name']
+        for fk in sa.inspect(op.get_bind()).get_foreign_keys('comments')
+    }
+    for name, column, referred_table in FOREIGN_KEYS:
+        if (column,) in existing:
+            op.drop_constraint(existing[(column,)], 'comments', type_='foreignkey')
+        op.create_foreign_key(name, 'comments', referred_table, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _recreate_foreign_keys('CASCADE')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _recreate_foreign_keys(None)
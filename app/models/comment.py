@@ -1,16 +1,33 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 from app.utils.database import Base
 
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        # 按文章分页顶层评论：WHERE post_id = ? AND parent_id IS NULL AND is_active ORDER BY created_at DESC, id DESC
+        Index(
+            "ix_comments_post_id_threads",
+            "post_id",
+            "created_at",
+            "id",
+            postgresql_where=text("parent_id IS NULL AND is_active"),
+        ),
+        # 文章评论统计：有效评论的数量与最新评论时间
+        Index("ix_comments_active_post_id_created_at", "post_id", "created_at", postgresql_where=text("is_active")),
+        # 递归查询回复
+        Index("ix_comments_parent_id", "parent_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    # 删除文章、上级评论时由数据库级联删除（评论本身只做软删除，级联只发生在删除文章时）
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    # 回复的上级评论，顶层评论为空
+    parent_id = Column(Integer, ForeignKey("comments.id", ondelete="CASCADE"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     is_active = Column(Boolean, default=True)
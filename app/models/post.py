@@ -1,11 +1,33 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
-from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index, Computed, DDL, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.sql import func, text
+from sqlalchemy.orm import relationship, deferred
 from app.utils.database import Base
 
+# 全文检索配置：simple 不做词干化，对中英文混排内容最稳妥
+SEARCH_CONFIG = "simple"
+
+# 检索向量由数据库在写入时自动维护（生成列），标题权重最高，其次摘要、正文
+SEARCH_VECTOR_SQL = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(summary, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(content, '')), 'C')"
+)
+
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # 公开文章列表（键集分页）：WHERE is_published ORDER BY created_at DESC, id DESC，只索引已发布文章
+        Index("ix_posts_published_created_at_id", "created_at", "id", postgresql_where=text("is_published")),
+        # 当前用户的文章列表：WHERE author_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_posts_author_id_created_at_id", "author_id", "created_at", "id"),
+        Index("ix_posts_search_vector", "search_vector", postgresql_using="gin"),
+        # 含中日韩文字的检索按子串匹配（ILIKE），由 pg_trgm 三元组索引支持
+        Index("ix_posts_title_trgm", "title", postgresql_using="gin", postgresql_ops={"title": "gin_trgm_ops"}),
+        Index("ix_posts_summary_trgm", "summary", postgresql_using="gin", postgresql_ops={"summary": "gin_trgm_ops"}),
+        Index("ix_posts_content_trgm", "content", postgresql_using="gin", postgresql_ops={"content": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(255), nullable=False, index=True)
@@ -16,8 +38,21 @@ class Post(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     published_at = Column(DateTime(timezone=True))
     is_published = Column(Boolean, default=False)
+    # 评论统计（冗余字段）：由评论的增删在同一事务中维护，app.utils.post_stats 定期校正
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_commented_at = Column(DateTime(timezone=True))
+    # 仅用于检索条件，默认不随文章加载
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
 
     # 关系
     author = relationship("User", back_populates="posts")
-    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
+    # 评论由外键的 ON DELETE CASCADE 删除：ORM 按主键顺序逐条删除会先删上级评论，违反回复的外键
+    comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan", passive_deletes=True)
     tags = relationship("Tag", secondary="post_tags", back_populates="posts")
+
+
+# 三元组索引依赖 pg_trgm 扩展，建表前确保已安装
+event.listen(
+    Post.__table__, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
+
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Table, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.utils.database import Base
@@ -6,7 +6,9 @@ from app.utils.database import Base
 # 文章和标签的多对多关系表
 PostTag = Table('post_tags', Base.metadata,
     Column('post_id', Integer, ForeignKey('posts.id'), primary_key=True),
-    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True)
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    # 主键以 post_id 开头，按标签筛选文章需要以 tag_id 开头的索引
+    Index('ix_post_tags_tag_id_post_id', 'tag_id', 'post_id')
 )
 
 class Tag(Base):
@@ -16,6 +18,8 @@ class Tag(Base):
     name = Column(String(50), unique=True, index=True, nullable=False)
     description = Column(String(255))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 已发布文章数（冗余字段）：由文章的标签与发布状态变化增量维护，app.utils.post_stats 定期校正
+    post_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # 关系
     posts = relationship("Post", secondary=PostTag, back_populates="tags")
@@ -1,33 +1,45 @@
 from datetime import timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils.database import get_db
-from app.utils.auth import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.utils.auth import (
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    get_principal,
+    oauth2_scheme,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    TOKEN_TYPE_REFRESH,
+)
+from app.utils.hashing import hash_password, verify_and_update
+from app.utils.revocation import revoked_tokens
 from app.models.user import User
-from app.schemas.auth import Token
+from app.schemas.auth import Token, RefreshRequest, LogoutRequest
 from app.schemas.user import UserCreate, User as UserSchema
 
 router = APIRouter()
 
 
 @router.post("/register", response_model=UserSchema)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """用户注册"""
     # 检查用户名是否已存在
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = await db.scalar(select(User).where(User.username == user.username))
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username already registered")
     # 检查邮箱是否已存在
-    db_user = db.query(User).filter(User.email == user.email).first()
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
     # 创建新用户
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = User(username=user.username, email=user.email, password_hash=hashed_password, full_name=user.full_name)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
@@ -57,7 +69,7 @@ async def get_login_data(request: Request):
 
 
 @router.post("/login", response_model=Token)
-async def login(login_data: dict = Depends(get_login_data), db: Session = Depends(get_db)):
+async def login(login_data: dict = Depends(get_login_data), db: AsyncSession = Depends(get_db)):
     """用户登录，支持表单和JSON格式"""
     # 查找用户
     username = login_data.get("username")
@@ -66,14 +78,68 @@ async def login(login_data: dict = Depends(get_login_data), db: Session = Depend
     if not username or not password:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Username and password are required")
 
-    user = db.query(User).filter(User.username == username).first()
-    if not user or not verify_password(password, user.password_hash):
+    user = await db.scalar(select(User).where(User.username == username))
+    valid, updated_hash = await verify_and_update(password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    # 创建访问令牌
+    # 哈希参数已调整：用本次登录的明文按新参数重新哈希
+    if updated_hash:
+        user.password_hash = updated_hash
+        await db.commit()
+    return issue_tokens(user.username)
+
+
+def issue_tokens(username: str) -> dict:
+    """签发一对访问令牌和刷新令牌"""
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
-    return {"access_token": access_token, "token_type": "bearer"}
+    access_token = create_access_token(data={"sub": username}, expires_delta=access_token_expires)
+    refresh_token = create_refresh_token(data={"sub": username})
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(refresh_request: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """用刷新令牌换取新的令牌对，旧刷新令牌随即失效（轮换）"""
+    invalid_token = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    payload = await decode_token(refresh_request.refresh_token, TOKEN_TYPE_REFRESH)
+    if payload is None or not payload.get("jti"):
+        raise invalid_token
+
+    # 原子地吊销旧刷新令牌，同一令牌并发刷新时只有一个请求成功
+    if not await revoked_tokens.revoke(payload["jti"], payload["exp"]):
+        raise invalid_token
+
+    # 用户已删除或停用时不再续期
+    user = await get_principal(db, payload)
+    if user is None or not user.is_active:
+        raise invalid_token
+    return issue_tokens(user.username)
+
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(logout_request: Optional[LogoutRequest] = None, token: str = Depends(oauth2_scheme)):
+    """注销：吊销当前访问令牌，以及请求体中的刷新令牌"""
+    payload = await decode_token(token)
+    if payload is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if payload.get("jti"):
+        await revoked_tokens.revoke(payload["jti"], payload["exp"])
+
+    if logout_request and logout_request.refresh_token:
+        refresh_payload = await decode_token(logout_request.refresh_token, TOKEN_TYPE_REFRESH)
+        # 只能注销属于自己的刷新令牌
+        if refresh_payload and refresh_payload.get("jti") and refresh_payload["sub"] == payload["sub"]:
+            await revoked_tokens.revoke(refresh_payload["jti"], refresh_payload["exp"])
+    return None
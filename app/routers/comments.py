@@ -1,108 +1,123 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
-from app.utils.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.utils.database import get_db, get_read_db
 from app.utils.auth import get_current_active_user
 from app.utils.redis import RedisCache, CacheKeys
+from app.utils.loaders import load_comment
+from app.utils.serializers import CachedResponse, render_json
+from app.utils.post_stats import record_comment_added, record_comment_removed
+from app.utils.post_cache import invalidate_post_detail
+from app.utils.comment_tree import load_comment_threads, thread_model
+from app.utils.fields import fields_key, parse_fields
+from app.utils.post_index import post_index
+from app.utils.pagination import NEXT_CURSOR_HEADER
 from app.models.user import User
 from app.models.comment import Comment
 from app.models.post import Post
-from app.schemas.comment import Comment as CommentSchema, CommentCreate, CommentUpdate
+from app.schemas.comment import Comment as CommentSchema, CommentCreate, CommentUpdate, CommentThread
 
 router = APIRouter()
 
+# 评论更新较频繁，客户端缓存时间较短，之后凭 ETag 重新验证
+COMMENTS_CACHE_CONTROL = "public, max-age=10, stale-while-revalidate=30"
+
 
 @router.post("/", response_model=CommentSchema)
-def create_comment(
-    comment: CommentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)
+async def create_comment(
+    comment: CommentCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)
 ):
     """创建新评论"""
-    # 检查文章是否存在
-    post = db.query(Post).filter(Post.id == comment.post_id).first()
-    if not post:
+    # 检查文章是否存在：优先使用存在性索引，无法确定时查询数据库
+    post_exists = await post_index.contains(comment.post_id)
+    if post_exists is None:
+        post_exists = await db.get(Post, comment.post_id) is not None
+    if not post_exists:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
+    # 回复评论时，上级评论必须属于同一篇文章且未被删除
+    if comment.parent_id is not None:
+        parent = await db.get(Comment, comment.parent_id)
+        if not parent or parent.post_id != comment.post_id or not parent.is_active:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parent comment not found")
+
     # 创建评论
-    db_comment = Comment(content=comment.content, author_id=current_user.id, post_id=comment.post_id)
+    db_comment = Comment(
+        content=comment.content, author_id=current_user.id, post_id=comment.post_id, parent_id=comment.parent_id
+    )
 
     db.add(db_comment)
-    db.commit()
-    db.refresh(db_comment)
+    try:
+        await db.flush()
+    except IntegrityError:
+        # 索引与数据库短暂不一致（文章刚被删除）时由外键约束兜底
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    # 在同一事务中更新文章的评论统计
+    await record_comment_added(db, db_comment.post_id)
+    await db.commit()
+    db_comment = await load_comment(db, db_comment.id)
 
     # 清除相关缓存
     # 清除该文章的评论缓存
-    RedisCache.delete_pattern(f"comments:{db_comment.post_id}:*")
+    await RedisCache.invalidate(CacheKeys.comments_namespace(db_comment.post_id))
+    # 清除文章详情缓存及包含该文章的列表页（评论统计已变化）
+    await invalidate_post_detail(db_comment.post_id)
 
     return db_comment
 
 
-@router.get("/post/{post_id}", response_model=List[CommentSchema])
-def get_comments_by_post(
-    post_id: int, skip: int = Query(0, ge=0), limit: int = Query(50, ge=1, le=100), db: Session = Depends(get_db)
+@router.get("/post/{post_id}", response_model=List[CommentThread])
+async def get_comments_by_post(
+    request: Request,
+    post_id: int,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """获取指定文章的评论"""
-    # 检查文章是否存在
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
+    """获取指定文章的评论串，按顶层评论分页，传入cursor时使用键集分页并忽略skip
+
+    传入 fields（如 id,content,author.username）时每条评论只返回所选字段，
+    replies 总是保留以维持评论串结构。
+    """
+    selection = parse_fields(fields, CommentThread)
+    # 检查文章是否存在：存在性索引可确定时无需查询数据库；
+    # 删除文章时会使其评论缓存失效，因此命中缓存也说明文章仍存在
+    post_exists = await post_index.contains(post_id)
+    if post_exists is False:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
     # 生成缓存键
-    cache_key = CacheKeys.comments(post_id, skip, limit)
-
-    # 尝试从缓存获取
-    cached_comments = RedisCache.get(cache_key)
-    if cached_comments:
-        return cached_comments
-
-    # 缓存未命中，从数据库查询
-    comments = (
-        db.query(Comment)
-        .filter(Comment.post_id == post_id, Comment.is_active == True)
-        .order_by(Comment.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    version = await RedisCache.get_version(CacheKeys.comments_namespace(post_id))
+    cache_key = CacheKeys.comments(version, post_id, skip, limit, cursor, fields_key(selection) if selection else None)
+
+    async def load(session: AsyncSession) -> CachedResponse:
+        """缓存未命中时从数据库查询"""
+        if post_exists is None and not await session.get(Post, post_id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        threads, next_cursor = await load_comment_threads(
+            session, post_id, limit, cursor=cursor, skip=skip, selection=selection
+        )
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+        return CachedResponse(render_json(List[thread_model(selection)], threads), headers)
 
-    # 将结果转换为可序列化的格式
-    comments_data = []
-    for comment in comments:
-        comment_dict = {
-            "id": comment.id,
-            "content": comment.content,
-            "author_id": comment.author_id,
-            "post_id": comment.post_id,
-            "created_at": comment.created_at.isoformat() if comment.created_at else None,
-            "updated_at": comment.updated_at.isoformat() if comment.updated_at else None,
-            "is_active": comment.is_active,
-            "author": {
-                "id": comment.author.id,
-                "username": comment.author.username,
-                "email": comment.author.email,
-                "full_name": comment.author.full_name,
-                "is_active": comment.author.is_active,
-                "is_admin": comment.author.is_admin,
-                "created_at": comment.author.created_at.isoformat() if comment.author.created_at else None,
-                "updated_at": comment.author.updated_at.isoformat() if comment.author.updated_at else None,
-            },
-        }
-        comments_data.append(comment_dict)
-
-    # 存入缓存
-    RedisCache.set(cache_key, comments_data, expire=300)  # 5分钟过期
-
-    return comments
+    # 命中时直接返回缓存的JSON字节，客户端已有相同内容时返回304；并发未命中只查询一次数据库
+    cached = await RedisCache.get_or_load(cache_key, load, db, expire=300)  # 5分钟后刷新
+    return cached.to_response(request, COMMENTS_CACHE_CONTROL)
 
 
 @router.put("/{comment_id}", response_model=CommentSchema)
-def update_comment(
+async def update_comment(
     comment_id: int,
     comment_update: CommentUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """更新评论"""
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = await load_comment(db, comment_id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
 
@@ -112,22 +127,22 @@ def update_comment(
 
     # 更新评论
     comment.content = comment_update.content
-    db.commit()
-    db.refresh(comment)
+    await db.commit()
+    comment = await load_comment(db, comment_id)
 
     # 清除相关缓存
     # 清除该文章的评论缓存
-    RedisCache.delete_pattern(f"comments:{comment.post_id}:*")
+    await RedisCache.invalidate(CacheKeys.comments_namespace(comment.post_id))
 
     return comment
 
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_comment(
-    comment_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)
+async def delete_comment(
+    comment_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)
 ):
     """删除评论"""
-    comment = db.query(Comment).filter(Comment.id == comment_id).first()
+    comment = await db.get(Comment, comment_id)
     if not comment:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
 
@@ -135,12 +150,17 @@ def delete_comment(
     if comment.author_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
 
-    # 软删除：将is_active设为False
-    comment.is_active = False
-    db.commit()
+    # 软删除：将is_active设为False，已删除的评论不重复计数
+    if comment.is_active:
+        comment.is_active = False
+        await db.flush()
+        await record_comment_removed(db, comment.post_id)
+        await db.commit()
 
     # 清除相关缓存
     # 清除该文章的评论缓存
-    RedisCache.delete_pattern(f"comments:{comment.post_id}:*")
+    await RedisCache.invalidate(CacheKeys.comments_namespace(comment.post_id))
+    # 清除文章详情缓存及包含该文章的列表页（评论统计已变化）
+    await invalidate_post_detail(comment.post_id)
 
     return None
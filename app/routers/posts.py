@@ -1,21 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from typing import List, Optional
+import time
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional, Union
 from datetime import datetime, timezone
-from app.utils.database import get_db
+from app.utils.database import get_db, get_read_db
 from app.utils.auth import get_current_active_user, get_current_admin_user, get_current_user_optional
-from app.utils.redis import RedisCache, CacheKeys
+from app.utils.redis import RedisCache, CacheKeys, CACHE_STALE_TTL
+from app.utils.pagination import keyset_filter, set_next_cursor, next_cursor_headers
+from app.utils.fields import fields_key, parse_fields, projected_model
+from app.utils.loaders import with_post_relations, with_post_list_relations, load_post, post_fields_load_options
+from app.utils.post_cache import (
+    invalidate_post_detail, invalidate_post_lists, invalidate_post_pages, list_page_references
+)
+from app.utils.post_index import post_index
+from app.utils.post_stats import published_tag_ids, record_post_tags_changed
+from app.utils.search import match_filter, search_posts as run_post_search
+from app.utils.serializers import CachedResponse, join_json_array, render_json
 from app.models.user import User
 from app.models.post import Post
 from app.models.tag import Tag
-from app.schemas.post import Post as PostSchema, PostCreate, PostUpdate
+from app.schemas.post import Post as PostSchema, PostCreate, PostUpdate, PostListItem, PostSearchResult
 
 router = APIRouter()
 
+# 公共响应的 Cache-Control：浏览器和CDN在 max-age 内直接复用，之后凭 ETag 重新验证；
+# 服务端的失效即时生效，max-age 即客户端可能看到旧内容的最长时间
+POST_LIST_CACHE_CONTROL = "public, max-age=30, stale-while-revalidate=60"
+POST_DETAIL_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
 
 @router.post("/", response_model=PostSchema)
-def create_post(post: PostCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def create_post(
+    post: PostCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)
+):
     """创建新文章"""
     # 创建文章
     db_post = Post(
@@ -27,197 +45,256 @@ def create_post(post: PostCreate, db: Session = Depends(get_db), current_user: U
     )
 
     # 添加标签
+    tags = []
     if post.tag_ids:
-        tags = db.query(Tag).filter(Tag.id.in_(post.tag_ids)).all()
-        db_post.tags = tags
+        tags = (await db.scalars(select(Tag).where(Tag.id.in_(post.tag_ids)))).all()
+        db_post.tags = list(tags)
 
     # 如果发布，设置发布时间
     if post.is_published:
         db_post.published_at = datetime.now(timezone.utc)
 
     db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
+    # 在同一事务中更新标签的文章数
+    tag_counts_changed = await record_post_tags_changed(db, set(), published_tag_ids(post.is_published, tags))
+    await db.commit()
+    db_post = await load_post(db, db_post.id)
+    # 记入文章存在性索引
+    await post_index.add(db_post.id)
 
     # 清除相关缓存
     if post.is_published:
-        # 清除文章列表缓存
-        RedisCache.delete_pattern("post:list:*")
+        # 清除文章列表和检索结果缓存
+        await invalidate_post_lists()
+    if tag_counts_changed:
+        # 清除标签列表缓存（标签云计数已变化）
+        await RedisCache.invalidate(CacheKeys.TAG_LIST)
 
     return db_post
 
 
-@router.get("/", response_model=List[PostSchema])
-def get_posts(
+@router.get("/", response_model=Union[List[PostListItem], List[PostSchema]])
+async def get_posts(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
     tag_id: Optional[int] = None,
     search: Optional[str] = None,
-    db: Session = Depends(get_db),
+    view: Literal["compact", "full"] = "compact",
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """获取文章列表"""
-    # 生成缓存键
-    cache_key = CacheKeys.post_list(skip, limit, tag_id, search)
-
-    # 尝试从缓存获取
-    cached_posts = RedisCache.get(cache_key)
-    if cached_posts:
-        return cached_posts
-
-    # 缓存未命中，从数据库查询
-    query = db.query(Post).filter(Post.is_published == True)
-
-    # 按标签筛选
-    if tag_id:
-        query = query.join(Post.tags).filter(Tag.id == tag_id)
+    """获取文章列表，传入cursor时使用键集分页并忽略skip
+
+    默认返回不含正文的精简列表项，view=full 时返回与文章详情相同的完整结构。
+    传入 fields（如 id,title,tags.name）时只返回所选字段，忽略 view。
+    """
+    selection = parse_fields(fields, PostSchema)
+    # 生成缓存键，带检索词的列表归入检索结果命名空间
+    version = await RedisCache.get_version(CacheKeys.POST_SEARCH if search else CacheKeys.POST_LIST)
+    cache_key = CacheKeys.post_list(
+        version, skip, limit, tag_id, search, cursor, view, fields_key(selection) if selection else None
+    )
 
-    # 搜索
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(Post.title.ilike(search_term), Post.content.ilike(search_term), Post.summary.ilike(search_term))
+    async def load(session: AsyncSession) -> CachedResponse:
+        """缓存未命中时从数据库查询"""
+        started = time.time()
+        query = select(Post).where(Post.is_published == True)
+
+        # 按标签筛选
+        if tag_id:
+            query = query.join(Post.tags).where(Tag.id == tag_id)
+
+        # 全文检索
+        if search:
+            query = query.where(match_filter(search))
+
+        # 排序并分页：有游标时按 (created_at, id) 定位，否则兼容旧的offset分页
+        query = query.order_by(Post.created_at.desc(), Post.id.desc())
+        if cursor:
+            query = keyset_filter(query, Post.created_at, Post.id, cursor)
+        else:
+            query = query.offset(skip)
+        query = query.limit(limit)
+
+        if view == "full" and not selection:
+            return await load_full_page(session, query, started)
+
+        # 精简视图只读取列表展示的列，不加载正文；字段投影只读取所选的列和关系
+        if selection:
+            query = query.options(*post_fields_load_options(selection))
+        else:
+            query = with_post_list_relations(query)
+        posts = (await session.scalars(query)).all()
+        # 记入反向索引，页中文章更新时只清除引用了它的页
+        references = list_page_references(posts, tag_id)
+
+        if selection:
+            schema = List[projected_model(PostSchema, selection)]
+            return CachedResponse(render_json(schema, posts), next_cursor_headers(posts, limit), references=references)
+        return CachedResponse(
+            render_json(List[PostListItem], posts), next_cursor_headers(posts, limit), references=references
         )
 
-    # 排序并分页
-    posts = query.order_by(Post.created_at.desc()).offset(skip).limit(limit).all()
-
-    # 将结果转换为可序列化的格式
-    posts_data = []
-    for post in posts:
-        post_dict = {
-            "id": post.id,
-            "title": post.title,
-            "content": post.content,
-            "summary": post.summary,
-            "author_id": post.author_id,
-            "created_at": post.created_at.isoformat() if post.created_at else None,
-            "updated_at": post.updated_at.isoformat() if post.updated_at else None,
-            "published_at": post.published_at.isoformat() if post.published_at else None,
-            "is_published": post.is_published,
-            "author": {
-                "id": post.author.id,
-                "username": post.author.username,
-                "email": post.author.email,
-                "full_name": post.author.full_name,
-                "is_active": post.author.is_active,
-                "is_admin": post.author.is_admin,
-                "created_at": post.author.created_at.isoformat() if post.author.created_at else None,
-                "updated_at": post.author.updated_at.isoformat() if post.author.updated_at else None,
-            },
-            "tags": [
-                {
-                    "id": tag.id,
-                    "name": tag.name,
-                    "description": tag.description,
-                    "created_at": tag.created_at.isoformat() if tag.created_at else None,
-                }
-                for tag in post.tags
-            ],
+    async def load_full_page(session: AsyncSession, query, started: float) -> CachedResponse:
+        """完整视图：先只查询本页文章的id，已缓存的详情用一次MGET取回，其余文章再按id批量加载"""
+        rows = (await session.execute(query.with_only_columns(Post.id, Post.created_at))).all()
+        keys = {row.id: CacheKeys.post_detail(row.id) for row in rows}
+        cached = await RedisCache.get_many_responses(keys.values())
+        # 只复用仍新鲜的详情，软过期的由下面重新加载并刷新
+        items = {
+            post_id: cached[key].body for post_id, key in keys.items() if key in cached and not cached[key].is_stale
         }
-        posts_data.append(post_dict)
 
-    # 存入缓存
-    RedisCache.set(cache_key, posts_data, expire=300)  # 5分钟过期
+        missing = [row.id for row in rows if row.id not in items]
+        if missing:
+            query = with_post_relations(select(Post)).where(Post.id.in_(missing), Post.is_published == True)
+            posts = (await session.scalars(query)).all()
+            # 逐篇序列化一次，拼接为列表响应，同时复用为各篇文章的详情缓存
+            rendered = {post.id: render_json(PostSchema, post) for post in posts}
+            # 顺带预热这些文章的详情缓存，通过一个pipeline写入；与详情查询一样引用各篇文章，
+            # 查询开始后文章发生变化的详情不写入
+            await RedisCache.set_many_responses(
+                {
+                    CacheKeys.post_detail(post_id): CachedResponse(item, references=[CacheKeys.post_ref(post_id)])
+                    for post_id, item in rendered.items()
+                },
+                expire=600,
+                stale_ttl=CACHE_STALE_TTL,
+                since=started,
+            )
+            items.update(rendered)
 
-    return posts
+        # 两次查询之间被删除或撤回的文章不再出现在本页中
+        body = join_json_array([items[row.id] for row in rows if row.id in items])
+        return CachedResponse(body, next_cursor_headers(rows, limit), references=list_page_references(rows, tag_id))
+
+    # 命中时直接返回缓存的JSON字节，客户端已有相同内容时返回304；并发未命中只查询一次数据库
+    cached = await RedisCache.get_or_load(cache_key, load, db, expire=300)  # 5分钟后刷新
+    return cached.to_response(request, POST_LIST_CACHE_CONTROL)
 
 
 @router.get("/me", response_model=List[PostSchema])
-def get_my_posts(
+async def get_my_posts(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
-    """获取当前用户的文章列表"""
-    posts = (
-        db.query(Post)
-        .filter(Post.author_id == current_user.id)
-        .order_by(Post.created_at.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    """获取当前用户的文章列表，传入cursor时使用键集分页并忽略skip"""
+    query = (
+        with_post_relations(select(Post))
+        .where(Post.author_id == current_user.id)
+        .order_by(Post.created_at.desc(), Post.id.desc())
     )
+    if cursor:
+        query = keyset_filter(query, Post.created_at, Post.id, cursor)
+    else:
+        query = query.offset(skip)
+    posts = (await db.scalars(query.limit(limit))).all()
+
+    set_next_cursor(response, posts, limit)
     return posts
 
 
-@router.get("/{post_id}", response_model=PostSchema)
-def get_post(
-    post_id: int, db: Session = Depends(get_db), current_user: Optional[User] = Depends(get_current_user_optional)
+@router.get("/search", response_model=List[PostSearchResult])
+async def search_posts(
+    q: str = Query(..., min_length=1, max_length=200),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """获取指定文章"""
+    """全文检索已发布文章，按相关度排序并返回高亮片段"""
     # 生成缓存键
-    cache_key = CacheKeys.post_detail(post_id)
+    version = await RedisCache.get_version(CacheKeys.POST_SEARCH)
+    cache_key = CacheKeys.post_search(version, q, skip, limit)
 
-    # 尝试从缓存获取
-    cached_post = RedisCache.get(cache_key)
-    if cached_post:
-        return cached_post
+    async def load(session: AsyncSession) -> CachedResponse:
+        """缓存未命中时从数据库检索"""
+        results = [
+            PostSearchResult(**PostSchema.model_validate(post).model_dump(), rank=rank, snippet=snippet)
+            for post, rank, snippet in await run_post_search(session, q, skip, limit)
+        ]
+        return CachedResponse(render_json(List[PostSearchResult], results), references=list_page_references(results))
 
-    # 缓存未命中，从数据库查询
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    # 命中时直接返回缓存的JSON字节；并发未命中只检索一次
+    cached = await RedisCache.get_or_load(cache_key, load, db, expire=300)  # 5分钟后刷新
+    return cached.to_response()
 
-    # 检查权限：如果文章未发布，只有作者可以查看
-    if not post.is_published:
-        # 如果文章未发布，需要验证用户身份
-        if not current_user or post.author_id != current_user.id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
-
-    # 将结果转换为可序列化的格式
-    post_data = {
-        "id": post.id,
-        "title": post.title,
-        "content": post.content,
-        "summary": post.summary,
-        "author_id": post.author_id,
-        "created_at": post.created_at.isoformat() if post.created_at else None,
-        "updated_at": post.updated_at.isoformat() if post.updated_at else None,
-        "published_at": post.published_at.isoformat() if post.published_at else None,
-        "is_published": post.is_published,
-        "author": {
-            "id": post.author.id,
-            "username": post.author.username,
-            "email": post.author.email,
-            "full_name": post.author.full_name,
-            "is_active": post.author.is_active,
-            "is_admin": post.author.is_admin,
-            "created_at": post.author.created_at.isoformat() if post.author.created_at else None,
-            "updated_at": post.author.updated_at.isoformat() if post.author.updated_at else None,
-        },
-        "tags": [
-            {
-                "id": tag.id,
-                "name": tag.name,
-                "description": tag.description,
-                "created_at": tag.created_at.isoformat() if tag.created_at else None,
-            }
-            for tag in post.tags
-        ],
-    }
-
-    # 存入缓存
-    RedisCache.set(cache_key, post_data, expire=600)  # 10分钟过期
 
+@router.get("/{post_id}", response_model=PostSchema)
+async def get_post(
+    request: Request,
+    post_id: int,
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: Optional[User] = Depends(get_current_user_optional),
+):
+    """获取指定文章，传入 fields 时只返回所选字段"""
+    selection = parse_fields(fields, PostSchema)
+    schema, options = PostSchema, None
+    # 生成缓存键：完整详情按文章缓存，字段投影归入文章的投影命名空间，失效时一并作废
+    if selection:
+        schema = projected_model(PostSchema, selection)
+        # 可见性检查需要发布状态和作者
+        options = post_fields_load_options(selection, required=("is_published", "author_id"))
+        version = await RedisCache.get_version(CacheKeys.post_fields_namespace(post_id))
+        cache_key = CacheKeys.post_detail_fields(version, post_id, fields_key(selection))
+    else:
+        cache_key = CacheKeys.post_detail(post_id)
+
+    async def load(session: AsyncSession) -> Optional[CachedResponse]:
+        """缓存未命中时从数据库查询；未发布文章只对作者可见，不写入公共缓存"""
+        post = await load_post(session, post_id, options)
+        if not post:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        if not post.is_published:
+            return None
+        # 引用该文章，文章变化时随反向索引清除，重建期间的变化据变更标记丢弃
+        return CachedResponse(render_json(schema, post), references=[CacheKeys.post_ref(post_id)])
+
+    # 命中时直接返回缓存的JSON字节，客户端已有相同内容时返回304；并发未命中只查询一次数据库
+    cached = await RedisCache.get_or_load(cache_key, load, db, expire=600)  # 10分钟后刷新
+    if cached:
+        return cached.to_response(request, POST_DETAIL_CACHE_CONTROL)
+
+    # 未发布文章：需要验证用户身份，只有作者可以查看
+    post = await load_post(db, post_id, options)
+    if not post:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    if not current_user or post.author_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    if selection:
+        return CachedResponse(render_json(schema, post)).to_response()
     return post
 
 
 @router.put("/{post_id}", response_model=PostSchema)
-def update_post(
+async def update_post(
     post_id: int,
     post_update: PostUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
     """更新文章"""
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = await load_post(db, post_id)
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
     # 检查权限：只有作者或管理员可以更新
     if post.author_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
+    old_tag_ids = published_tag_ids(post.is_published, post.tags)
+    was_published = post.is_published
+    previous_tag_ids = {tag.id for tag in post.tags}
+    # 标题、摘要或正文变化会影响检索结果
+    text_changed = any(
+        getattr(post_update, field) is not None and getattr(post_update, field) != getattr(post, field)
+        for field in ("title", "content", "summary")
+    )
 
     # 更新文章信息
     if post_update.title is not None:
@@ -234,25 +311,39 @@ def update_post(
 
     # 更新标签
     if post_update.tag_ids is not None:
-        tags = db.query(Tag).filter(Tag.id.in_(post_update.tag_ids)).all()
-        post.tags = tags
+        tags = (await db.scalars(select(Tag).where(Tag.id.in_(post_update.tag_ids)))).all()
+        post.tags = list(tags)
 
-    db.commit()
-    db.refresh(post)
+    # 标签或发布状态变化时，在同一事务中更新标签的文章数
+    tag_counts_changed = await record_post_tags_changed(
+        db, old_tag_ids, published_tag_ids(post.is_published, post.tags)
+    )
+    await db.commit()
+    post = await load_post(db, post_id)
 
     # 清除相关缓存
-    # 清除文章详情缓存
-    RedisCache.delete(CacheKeys.post_detail(post_id))
-    # 清除文章列表缓存
-    RedisCache.delete_pattern("post:list:*")
+    # 清除文章详情缓存（含各字段投影）
+    await invalidate_post_detail(post_id)
+    if post.is_published != was_published:
+        # 发布或撤回：列表中的文章集合变化，清除全部列表和检索结果缓存
+        await invalidate_post_lists()
+    elif post.is_published:
+        # 已发布文章的内容变化：包含该文章的列表页已随详情清除，再清除标签增减涉及的标签筛选页
+        await invalidate_post_pages(previous_tag_ids ^ {tag.id for tag in post.tags}, text_changed)
+    # 未发布的草稿不出现在任何列表中，无需清除
+    if tag_counts_changed:
+        # 清除标签列表缓存（标签云计数已变化）
+        await RedisCache.invalidate(CacheKeys.TAG_LIST)
 
     return post
 
 
 @router.delete("/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_post(post_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_active_user)):
+async def delete_post(
+    post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_active_user)
+):
     """删除文章"""
-    post = db.query(Post).filter(Post.id == post_id).first()
+    post = await load_post(db, post_id)
     if not post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
 
@@ -260,13 +351,23 @@ def delete_post(post_id: int, db: Session = Depends(get_db), current_user: User
     if post.author_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
 
-    db.delete(post)
-    db.commit()
+    # 在同一事务中扣减标签的文章数
+    was_published = post.is_published
+    tag_counts_changed = await record_post_tags_changed(db, published_tag_ids(post.is_published, post.tags), set())
+    await db.delete(post)
+    await db.commit()
+    await post_index.remove(post_id)
 
     # 清除相关缓存
-    # 清除文章详情缓存
-    RedisCache.delete(CacheKeys.post_detail(post_id))
-    # 清除文章列表缓存
-    RedisCache.delete_pattern("post:list:*")
+    # 清除文章详情缓存（含各字段投影）
+    await invalidate_post_detail(post_id)
+    # 清除该文章的评论缓存（评论读取命中缓存时不再检查文章是否存在）
+    await RedisCache.invalidate(CacheKeys.comments_namespace(post_id))
+    if tag_counts_changed:
+        # 清除标签列表缓存（标签云计数已变化）
+        await RedisCache.invalidate(CacheKeys.TAG_LIST)
+    if was_published:
+        # 删除已发布文章：其后各页的内容都会前移，清除全部列表和检索结果缓存；草稿不在任何列表中
+        await invalidate_post_lists()
 
     return None
@@ -1,21 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.utils.database import get_db
+from app.utils.database import get_db, get_read_db
 from app.utils.auth import get_current_active_user, get_current_admin_user
 from app.utils.redis import RedisCache, CacheKeys
+from app.utils.post_cache import invalidate_post_lists
+from app.utils.serializers import CachedResponse, render_json
 from app.models.user import User
 from app.models.tag import Tag
-from app.schemas.tag import Tag as TagSchema, TagCreate, TagUpdate
+from app.schemas.tag import Tag as TagSchema, TagCreate, TagUpdate, TagCloudItem
 
 router = APIRouter()
 
+# 标签很少变化，客户端可缓存较长时间，之后凭 ETag 重新验证
+TAG_LIST_CACHE_CONTROL = "public, max-age=300, stale-while-revalidate=600"
+
 
 @router.post("/", response_model=TagSchema)
-def create_tag(tag: TagCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+async def create_tag(
+    tag: TagCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_admin_user)
+):
     """创建新标签"""
     # 检查标签名是否已存在
-    existing_tag = db.query(Tag).filter(Tag.name == tag.name).first()
+    existing_tag = await db.scalar(select(Tag).where(Tag.name == tag.name))
     if existing_tag:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tag name already exists")
 
@@ -23,70 +31,84 @@ def create_tag(tag: TagCreate, db: Session = Depends(get_db), current_user: User
     db_tag = Tag(name=tag.name, description=tag.description)
 
     db.add(db_tag)
-    db.commit()
-    db.refresh(db_tag)
+    await db.commit()
+    await db.refresh(db_tag)
 
     # 清除标签列表缓存
-    RedisCache.delete(CacheKeys.tag_list())
+    await RedisCache.invalidate(CacheKeys.TAG_LIST)
 
     return db_tag
 
 
 @router.get("/", response_model=List[TagSchema])
-def get_tags(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=100), db: Session = Depends(get_db)):
+async def get_tags(
+    request: Request,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
     """获取标签列表"""
-    # 生成缓存键
-    cache_key = CacheKeys.tag_list()
+    # 生成缓存键，每一页单独缓存
+    version = await RedisCache.get_version(CacheKeys.TAG_LIST)
+    cache_key = CacheKeys.tag_list(version, skip, limit)
 
-    # 尝试从缓存获取
-    cached_tags = RedisCache.get(cache_key)
-    if cached_tags:
-        return cached_tags
+    async def load(session: AsyncSession) -> CachedResponse:
+        """缓存未命中时从数据库查询"""
+        tags = (await session.scalars(select(Tag).order_by(Tag.id).offset(skip).limit(limit))).all()
+        return CachedResponse(render_json(List[TagSchema], tags))
 
-    # 缓存未命中，从数据库查询
-    tags = db.query(Tag).offset(skip).limit(limit).all()
+    # 命中时直接返回缓存的JSON字节，客户端已有相同内容时返回304；并发未命中只查询一次数据库
+    cached = await RedisCache.get_or_load(cache_key, load, db, expire=3600)  # 1小时后刷新
+    return cached.to_response(request, TAG_LIST_CACHE_CONTROL)
 
-    # 将结果转换为可序列化的格式
-    tags_data = []
-    for tag in tags:
-        tag_dict = {
-            "id": tag.id,
-            "name": tag.name,
-            "description": tag.description,
-            "created_at": tag.created_at.isoformat() if tag.created_at else None,
-        }
-        tags_data.append(tag_dict)
 
-    # 存入缓存
-    RedisCache.set(cache_key, tags_data, expire=3600)  # 1小时过期
+@router.get("/cloud", response_model=List[TagCloudItem])
+async def get_tag_cloud(request: Request, db: AsyncSession = Depends(get_read_db)):
+    """标签云：各标签的已发布文章数，按文章数降序，直接读取冗余计数而不统计关联表"""
+    # 生成缓存键
+    version = await RedisCache.get_version(CacheKeys.TAG_LIST)
+    cache_key = CacheKeys.tag_cloud(version)
+
+    async def load(session: AsyncSession) -> CachedResponse:
+        """缓存未命中时从数据库查询"""
+        tags = (
+            await session.execute(
+                select(Tag.id, Tag.name, Tag.post_count)
+                .where(Tag.post_count > 0)
+                .order_by(Tag.post_count.desc(), Tag.name)
+            )
+        ).all()
+        return CachedResponse(render_json(List[TagCloudItem], tags))
 
-    return tags
+    # 命中时直接返回缓存的JSON字节，客户端已有相同内容时返回304；并发未命中只查询一次数据库
+    cached = await RedisCache.get_or_load(cache_key, load, db, expire=3600)  # 1小时后刷新
+    return cached.to_response(request, TAG_LIST_CACHE_CONTROL)
 
 
 @router.get("/{tag_id}", response_model=TagSchema)
-def get_tag(tag_id: int, db: Session = Depends(get_db)):
+async def get_tag(tag_id: int, db: AsyncSession = Depends(get_db)):
     """获取指定标签详情"""
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.get(Tag, tag_id)
     if not tag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
     return tag
 
 
 @router.put("/{tag_id}", response_model=TagSchema)
-def update_tag(
+async def update_tag(
     tag_id: int,
     tag_update: TagUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_admin_user),
 ):
     """更新标签"""
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.get(Tag, tag_id)
     if not tag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
 
     # 检查新标签名是否已被其他标签使用
     if tag_update.name and tag_update.name != tag.name:
-        existing_tag = db.query(Tag).filter(Tag.name == tag_update.name).first()
+        existing_tag = await db.scalar(select(Tag).where(Tag.name == tag_update.name))
         if existing_tag:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Tag name already exists")
         tag.name = tag_update.name
@@ -94,30 +116,32 @@ def update_tag(
     if tag_update.description is not None:
         tag.description = tag_update.description
 
-    db.commit()
-    db.refresh(tag)
+    await db.commit()
+    await db.refresh(tag)
 
     # 清除标签列表缓存
-    RedisCache.delete(CacheKeys.tag_list())
-    # 清除文章列表缓存（因为标签变化可能影响文章列表）
-    RedisCache.delete_pattern("post:list:*")
+    await RedisCache.invalidate(CacheKeys.TAG_LIST)
+    # 清除文章列表和检索结果缓存（列表项中包含标签）
+    await invalidate_post_lists()
 
     return tag
 
 
 @router.delete("/{tag_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_tag(tag_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_admin_user)):
+async def delete_tag(
+    tag_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_admin_user)
+):
     """删除标签"""
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.get(Tag, tag_id)
     if not tag:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tag not found")
 
-    db.delete(tag)
-    db.commit()
+    await db.delete(tag)
+    await db.commit()
 
     # 清除标签列表缓存
-    RedisCache.delete(CacheKeys.tag_list())
-    # 清除文章列表缓存（因为标签变化可能影响文章列表）
-    RedisCache.delete_pattern("post:list:*")
+    await RedisCache.invalidate(CacheKeys.TAG_LIST)
+    # 清除文章列表和检索结果缓存（列表项中包含标签）
+    await invalidate_post_lists()
 
     return None
@@ -1,52 +1,60 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 from app.utils.database import get_db
-from app.utils.auth import get_current_active_user, get_password_hash
+from app.utils.auth import get_current_active_user, invalidate_principal
+from app.utils.hashing import hash_password
 from app.models.user import User
 from app.schemas.user import User as UserSchema, UserUpdate
 
 router = APIRouter()
 
 @router.get("/me", response_model=UserSchema)
-def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
     """获取当前用户信息"""
     return current_user
 
 @router.put("/me", response_model=UserSchema)
-def update_current_user(
+async def update_current_user(
     user_update: UserUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """更新当前用户信息"""
+    # 当前用户可能来自身份缓存，修改前从数据库重新加载
+    user = await db.get(User, current_user.id)
+
     # 更新用户信息
     if user_update.email is not None:
         # 检查邮箱是否已被其他用户使用
-        db_user = db.query(User).filter(User.email == user_update.email).first()
-        if db_user and db_user.id != current_user.id:
+        db_user = await db.scalar(select(User).where(User.email == user_update.email))
+        if db_user and db_user.id != user.id:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
-        current_user.email = user_update.email
+        user.email = user_update.email
     if user_update.full_name is not None:
-        current_user.full_name = user_update.full_name
+        user.full_name = user_update.full_name
     if user_update.password is not None:
-        current_user.password_hash = get_password_hash(user_update.password)
+        user.password_hash = await hash_password(user_update.password)
     
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    await db.commit()
+    await db.refresh(user)
+
+    # 清除该用户的身份缓存
+    await invalidate_principal(user.username)
+    return user
 
 @router.get("/{user_id}", response_model=UserSchema)
-def get_user(
+async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取指定用户信息"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,13 +1,15 @@
 from app.schemas.user import UserCreate, UserUpdate, UserInDB, User
-from app.schemas.post import PostCreate, PostUpdate, PostInDB, Post
-from app.schemas.comment import CommentCreate, CommentUpdate, CommentInDB, Comment
-from app.schemas.tag import TagCreate, TagUpdate, TagInDB, Tag
-from app.schemas.auth import Token, TokenData
+from app.schemas.post import (
+    PostCreate, PostUpdate, PostInDB, Post, PostListAuthor, PostListTag, PostListItem, PostSearchResult
+)
+from app.schemas.comment import CommentCreate, CommentUpdate, CommentInDB, Comment, CommentThread
+from app.schemas.tag import TagCreate, TagUpdate, TagInDB, Tag, TagCloudItem
+from app.schemas.auth import Token, TokenData, RefreshRequest, LogoutRequest
 
 __all__ = [
     "UserCreate", "UserUpdate", "UserInDB", "User",
-    "PostCreate", "PostUpdate", "PostInDB", "Post",
-    "CommentCreate", "CommentUpdate", "CommentInDB", "Comment",
-    "TagCreate", "TagUpdate", "TagInDB", "Tag",
-    "Token", "TokenData"
+    "PostCreate", "PostUpdate", "PostInDB", "Post", "PostListAuthor", "PostListTag", "PostListItem", "PostSearchResult",
+    "CommentCreate", "CommentUpdate", "CommentInDB", "Comment", "CommentThread",
+    "TagCreate", "TagUpdate", "TagInDB", "Tag", "TagCloudItem",
+    "Token", "TokenData", "RefreshRequest", "LogoutRequest"
 ]
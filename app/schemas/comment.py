@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from app.schemas.user import User
 
 
@@ -10,6 +10,7 @@ class CommentBase(BaseModel):
 
 class CommentCreate(CommentBase):
     post_id: int
+    parent_id: Optional[int] = None
 
 
 class CommentUpdate(BaseModel):
@@ -20,6 +21,7 @@ class CommentInDB(CommentBase):
     id: int
     author_id: int
     post_id: int
+    parent_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
     is_active: bool
@@ -29,3 +31,7 @@ class CommentInDB(CommentBase):
 
 class Comment(CommentInDB):
     author: User
+
+
+class CommentThread(Comment):
+    replies: List["CommentThread"] = []
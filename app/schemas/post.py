@@ -31,6 +31,8 @@ class PostInDB(PostBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     published_at: Optional[datetime] = None
+    comment_count: int = 0
+    last_commented_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -38,3 +40,40 @@ class PostInDB(PostBase):
 class Post(PostInDB):
     author: User
     tags: List[Tag]
+
+
+class PostListAuthor(BaseModel):
+    id: int
+    username: str
+    full_name: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PostListTag(BaseModel):
+    id: int
+    name: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PostListItem(BaseModel):
+    """文章列表项：不含正文，作者和标签只保留列表展示所需的字段"""
+
+    id: int
+    title: str
+    summary: Optional[str] = None
+    author_id: int
+    created_at: datetime
+    published_at: Optional[datetime] = None
+    comment_count: int = 0
+    last_commented_at: Optional[datetime] = None
+    author: PostListAuthor
+    tags: List[PostListTag]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class PostSearchResult(Post):
+    rank: float
+    snippet: Optional[str] = None
@@ -26,3 +26,11 @@ class TagInDB(TagBase):
 
 class Tag(TagInDB):
     pass
+
+
+class TagCloudItem(BaseModel):
+    id: int
+    name: str
+    post_count: int
+
+    model_config = ConfigDict(from_attributes=True)
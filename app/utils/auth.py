@@ -1,14 +1,20 @@
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+import time
+import uuid
 from jose import JWTError, jwt
-from pwdlib import PasswordHash
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from dotenv import load_dotenv
 import os
 from app.utils.database import get_db
+from app.utils.hashing import pwd_hash
+from app.utils.redis import RedisCache, CacheKeys
+from app.utils.revocation import revoked_tokens
 from app.models.user import User
+from app.schemas.user import User as UserSchema
 
 # 加载环境变量
 load_dotenv()
@@ -17,9 +23,13 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+# 已认证用户的缓存时间（秒），0表示每个请求都查询数据库
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
 
-# 密码加密上下文
-pwd_hash = PasswordHash.recommended()
+# 令牌类型：刷新令牌只能用于换取新令牌，不能访问接口
+TOKEN_TYPE_ACCESS = "access"
+TOKEN_TYPE_REFRESH = "refresh"
 
 # OAuth2密码承载令牌
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -38,42 +48,93 @@ def get_token_optional(request: Request) -> Optional[str]:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
+    """验证密码（同步，会阻塞调用线程；请求处理中使用 app.utils.hashing 的异步版本）"""
     return pwd_hash.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """获取密码哈希值"""
+    """获取密码哈希值（同步，会阻塞调用线程；请求处理中使用 app.utils.hashing 的异步版本）"""
     return pwd_hash.hash(password)
 
 
+def _create_token(data: dict, token_type: str, expires_delta: timedelta) -> str:
+    """签发指定类型的令牌"""
+    to_encode = data.copy()
+    expire = datetime.now(timezone.utc) + expires_delta
+    # jti 标识单个令牌，用于身份缓存键和吊销
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": token_type})
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建访问令牌"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now(timezone.utc) + expires_delta
-    else:
-        expire = datetime.now(timezone.utc) + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return _create_token(data, TOKEN_TYPE_ACCESS, expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
+def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
+    """创建刷新令牌"""
+    return _create_token(data, TOKEN_TYPE_REFRESH, expires_delta or timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS))
+
+
+async def decode_token(token: str, token_type: str = TOKEN_TYPE_ACCESS) -> Optional[dict]:
+    """校验令牌签名、有效期、类型和吊销状态，无效时返回None
+
+    吊销检查先查本地布隆过滤器，校验过程不访问数据库。未携带 type 的旧令牌视为访问令牌。
+    """
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("sub") is None or payload.get("type", TOKEN_TYPE_ACCESS) != token_type:
+        return None
+    jti = payload.get("jti")
+    if jti and await revoked_tokens.is_revoked(jti):
+        return None
+    return payload
+
+
+async def get_principal(db: AsyncSession, payload: dict) -> Optional[User]:
+    """按令牌载荷获取用户，优先读取身份缓存
+
+    缓存键由用户名、用户缓存版本号和令牌的 jti 组成；用户信息变更或被停用时调用
+    invalidate_principal 递增版本号，该用户所有令牌的缓存同时失效。缓存命中时返回的
+    是不属于任何会话的 User 对象，需要修改用户时应从数据库重新加载。
+    """
+    username = payload.get("sub")
+    jti = payload.get("jti")
+    cache_key = None
+    if jti and PRINCIPAL_CACHE_TTL > 0:
+        version = await RedisCache.get_version(CacheKeys.principal_namespace(username))
+        cache_key = CacheKeys.principal(username, version, jti)
+        cached = await RedisCache.get(cache_key)
+        if cached:
+            return User(**UserSchema.model_validate(cached).model_dump())
+
+    user = await db.scalar(select(User).where(User.username == username))
+    # 只缓存活跃用户，且不超过令牌剩余有效期
+    if cache_key and user is not None and user.is_active:
+        expire = min(PRINCIPAL_CACHE_TTL, int(payload.get("exp", 0) - time.time()))
+        if expire > 0:
+            await RedisCache.set(cache_key, UserSchema.model_validate(user).model_dump(mode="json"), expire=expire)
+    return user
+
 
+async def invalidate_principal(username: str) -> None:
+    """使该用户的身份缓存失效"""
+    await RedisCache.invalidate(CacheKeys.principal_namespace(username))
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
     """获取当前用户"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    payload = await decode_token(token)
+    if payload is None:
         raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+    user = await get_principal(db, payload)
     if user is None:
         raise credentials_exception
     if not user.is_active:
@@ -95,22 +156,16 @@ async def get_current_admin_user(current_user: User = Depends(get_current_user))
     return current_user
 
 
-def get_current_user_optional(
-    token: Optional[str] = Depends(get_token_optional), db: Session = Depends(get_db)
+async def get_current_user_optional(
+    token: Optional[str] = Depends(get_token_optional), db: AsyncSession = Depends(get_db)
 ) -> Optional[User]:
     """获取当前用户（可选）"""
     if not token:
         return None
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            return None
-        user = db.query(User).filter(User.username == username).first()
-        if user is None:
-            return None
-        if not user.is_active:
-            return None
-        return user
-    except JWTError:
+    payload = await decode_token(token)
+    if payload is None:
+        return None
+    user = await get_principal(db, payload)
+    if user is None or not user.is_active:
         return None
+    return user
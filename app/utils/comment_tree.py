@@ -0,0 +1,82 @@
+from typing import Dict, List, Optional, Tuple, Type
+from pydantic import BaseModel
+from sqlalchemy import select
+from app.models.comment import Comment
+from app.schemas.comment import CommentThread
+from app.utils.fields import FieldSelection, projected_model
+from app.utils.loaders import comment_fields_load_options, comment_load_options
+from app.utils.pagination import keyset_filter, next_cursor
+
+
+async def load_comment_threads(
+    db,
+    post_id: int,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    selection: Optional[FieldSelection] = None,
+) -> Tuple[List[BaseModel], Optional[str]]:
+    """加载一页评论串（顶层评论及其全部回复）及下一页游标，只执行一条递归查询
+
+    顶层评论按 (created_at, id) 降序分页，回复按时间正序挂到上级评论下。
+    已删除的评论不显示，其下的回复也一并隐藏。
+    传入字段选择时只读取所选的列，节点只包含所选字段和 replies。
+    """
+    # 当前页的顶层评论
+    roots = (
+        select(Comment.id)
+        .where(Comment.post_id == post_id, Comment.parent_id.is_(None), Comment.is_active == True)
+        .order_by(Comment.created_at.desc(), Comment.id.desc())
+    )
+    if cursor:
+        roots = keyset_filter(roots, Comment.created_at, Comment.id, cursor)
+    else:
+        roots = roots.offset(skip)
+    roots = roots.limit(limit)
+
+    # 从顶层评论出发递归查找所有有效回复
+    tree = select(Comment.id).where(Comment.id.in_(roots.scalar_subquery())).cte("comment_tree", recursive=True)
+    tree = tree.union_all(
+        select(Comment.id).join(tree, Comment.parent_id == tree.c.id).where(Comment.is_active == True)
+    )
+    options = comment_load_options() if selection is None else comment_fields_load_options(selection)
+    statement = (
+        select(Comment)
+        .options(*options)
+        .join(tree, tree.c.id == Comment.id)
+        .order_by(Comment.created_at, Comment.id)
+    )
+    comments = (await db.scalars(statement)).all()
+
+    model = thread_model(selection)
+    # 游标取自顶层评论本身，投影后的节点可能不含 created_at 和 id
+    roots = [comment for comment in reversed(comments) if comment.parent_id is None]
+    return build_threads(comments, model), next_cursor(roots, limit)
+
+
+def thread_model(selection: Optional[FieldSelection] = None) -> Type[BaseModel]:
+    """评论串节点的响应模型；字段投影总是保留 replies 以维持嵌套结构"""
+    if selection is None:
+        return CommentThread
+    return projected_model(CommentThread, {**selection, "replies": None})
+
+
+def build_threads(comments: List[Comment], model: Type[BaseModel] = CommentThread) -> List[BaseModel]:
+    """将按时间正序排列的评论组装为嵌套结构，一次遍历完成
+
+    上级评论总是早于回复创建，正序遍历时上级节点已经存在。
+    model 为节点的响应模型，须包含 replies 字段。
+    """
+    nodes: Dict[int, BaseModel] = {}
+    threads: List[BaseModel] = []
+    for comment in comments:
+        node = model.model_validate(comment)
+        nodes[comment.id] = node
+        parent = nodes.get(comment.parent_id)
+        if parent is not None:
+            parent.replies.append(node)
+        else:
+            threads.append(node)
+    # 顶层评论串按时间倒序返回
+    threads.reverse()
+    return threads
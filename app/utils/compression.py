@@ -0,0 +1,76 @@
+import gzip
+import os
+from typing import Dict, Iterable, Optional
+from dotenv import load_dotenv
+
+# brotli 为可选依赖（pip install brotli 或安装 compression 附加依赖），未安装时不提供 br
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# zstd 需要 Python 3.14 标准库中的 compression.zstd，低版本不提供
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+# 加载环境变量
+load_dotenv()
+
+# 响应体小于该字节数时不压缩，压缩收益抵不上客户端解压和额外的缓存空间
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+# 各压缩格式的压缩函数；压缩结果随缓存条目保存，只在写入缓存时计算一次
+_COMPRESSORS = {"gzip": lambda body: gzip.compress(body, compresslevel=6, mtime=0)}
+if brotli is not None:
+    _COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=6)
+if zstd is not None:
+    _COMPRESSORS["zstd"] = lambda body: zstd.compress(body, level=6)
+
+# 客户端对多种格式的偏好相同时，服务端按此顺序选择（压缩率从高到低）
+PREFERRED_ENCODINGS = ("zstd", "br", "gzip")
+
+
+def available_encodings() -> Iterable[str]:
+    """当前环境可用的压缩格式"""
+    return tuple(encoding for encoding in PREFERRED_ENCODINGS if encoding in _COMPRESSORS)
+
+
+def compress_variants(body: bytes) -> Dict[str, bytes]:
+    """预先计算响应体的各压缩版本；响应体过小或压缩后不更小的格式不保留"""
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return {}
+    variants = {}
+    for encoding in available_encodings():
+        compressed = _COMPRESSORS[encoding](body)
+        if len(compressed) < len(body):
+            variants[encoding] = compressed
+    return variants
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """按 Accept-Encoding 及其 q 值从可用格式中选择压缩格式，不接受任何可用格式时返回None"""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+
+    best, best_weight = None, 0.0
+    for encoding in PREFERRED_ENCODINGS:
+        if encoding not in available:
+            continue
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
@@ -1,26 +1,18 @@
 import logging
-import traceback
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
 from sqlalchemy.exc import SQLAlchemyError
+from app.utils.logger import setup_logging
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+# 配置日志：写文件和标准输出都在后台线程中进行
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
 async def global_exception_handler(request: Request, exc: Exception):
     """全局异常处理器"""
     # 记录异常信息
-    logger.error(f"Unhandled exception: {exc}")
-    logger.error(traceback.format_exc())
+    logger.error("Unhandled exception: %s", exc, exc_info=exc)
     
     # 根据异常类型返回不同的响应
     if isinstance(exc, SQLAlchemyError):
@@ -43,7 +35,7 @@ class CustomException(Exception):
 
 async def custom_exception_handler(request: Request, exc: CustomException):
     """自定义异常处理器"""
-    logger.error(f"Custom exception: {exc.detail}")
+    logger.error("Custom exception: %s", exc.detail)
     return JSONResponse(
         status_code=exc.status_code,
         content={"detail": exc.detail}
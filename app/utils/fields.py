@@ -0,0 +1,140 @@
+import types
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Type, Union, get_args, get_origin
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ConfigDict, create_model
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+# 字段选择：字段名 -> 子字段选择，None 表示该字段的全部内容
+FieldSelection = Dict[str, Optional["FieldSelection"]]
+
+
+def parse_fields(raw: Optional[str], schema: Type[BaseModel]) -> Optional[FieldSelection]:
+    """解析 fields 参数（如 id,title,tags.name），按响应模型校验字段名
+
+    未传入或为空时返回None，表示返回全部字段；包含未知字段时返回400。
+    同时选择 tags 和 tags.name 时以整个 tags 为准。
+    """
+    if raw is None:
+        return None
+    paths = [path.strip() for path in raw.split(",") if path.strip()]
+    if not paths:
+        return None
+
+    selection: FieldSelection = {}
+    for path in paths:
+        node, model = selection, schema
+        parts = path.split(".")
+        for depth, name in enumerate(parts):
+            if model is None or name not in model.model_fields:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown field: {path}")
+            if depth == len(parts) - 1:
+                node[name] = None
+                break
+            if name in node and node[name] is None:
+                # 已选择整个字段，子字段无需再记录，但仍校验其名称
+                node = {}
+            else:
+                node = node.setdefault(name, {})
+            model = _nested_model(model.model_fields[name].annotation)
+    return selection
+
+
+def fields_key(selection: FieldSelection) -> str:
+    """规范化的字段选择：路径排序去重后拼接，写法不同的同一投影得到相同的缓存键"""
+    return ",".join(sorted(_paths(selection)))
+
+
+def _paths(selection: FieldSelection, prefix: str = "") -> Iterator[str]:
+    for name, children in selection.items():
+        if children is None:
+            yield prefix + name
+        else:
+            yield from _paths(children, f"{prefix}{name}.")
+
+
+def _nested_model(annotation: Any) -> Optional[Type[BaseModel]]:
+    """字段类型中的嵌套模型（支持 List[...] 与 Optional[...]），标量字段返回None"""
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for arg in get_args(annotation):
+        model = _nested_model(arg)
+        if model is not None:
+            return model
+    return None
+
+
+def _replace_model(annotation: Any, old: Type[BaseModel], new: Type[BaseModel]) -> Any:
+    """将字段类型中的嵌套模型替换为投影后的模型，保留外层的 List / Optional"""
+    if annotation is old:
+        return new
+    args = get_args(annotation)
+    if not args:
+        return annotation
+    args = tuple(_replace_model(arg, old, new) for arg in args)
+    origin = get_origin(annotation)
+    if origin in (Union, types.UnionType):
+        return Union[args]
+    return origin[args] if len(args) > 1 else origin[args[0]]
+
+
+def projected_model(schema: Type[BaseModel], selection: FieldSelection) -> Type[BaseModel]:
+    """只包含所选字段的响应模型，同一投影只构建一次"""
+    return _projected_model(schema, fields_key(selection))
+
+
+@lru_cache(maxsize=256)
+def _projected_model(schema: Type[BaseModel], key: str) -> Type[BaseModel]:
+    selection = parse_fields(key, schema)
+    name = f"{schema.__name__}Fields"
+    definitions = {}
+    # 按响应模型中的字段顺序输出
+    for field_name, field in schema.model_fields.items():
+        if field_name not in selection:
+            continue
+        children = selection[field_name]
+        annotation = field.annotation
+        nested = _nested_model(annotation)
+        if nested is schema:
+            # 自引用字段（如评论串的 replies）的元素与上级使用同一投影
+            annotation = _replace_model(annotation, nested, name)
+        elif nested is not None and children is not None:
+            annotation = _replace_model(annotation, nested, projected_model(nested, children))
+        definitions[field_name] = (annotation, ... if field.is_required() else field.default)
+    return create_model(name, __config__=ConfigDict(from_attributes=True), **definitions)
+
+
+def field_load_options(
+    model: type,
+    selection: FieldSelection,
+    relation_loaders: Dict[str, Callable],
+    required: Iterable[str] = (),
+) -> list:
+    """将字段选择转换为列级加载（load_only）与关系加载选项
+
+    只读取所选字段对应的列，未选择的关系不加载；relation_loaders 给出各关系的加载方式
+    （joinedload / selectinload），关系的子字段同样只读取对应的列。
+    required 为查询自身需要的列（如分页游标用到的 created_at），不影响响应内容。
+    不对应数据库列的字段（如 tag_ids）不参与查询，由响应模型取默认值。
+    """
+    mapper = inspect(model)
+    columns = set(required)
+    options = []
+    for name, children in selection.items():
+        if name in mapper.column_attrs:
+            columns.add(name)
+        elif name in mapper.relationships and name in relation_loaders:
+            relationship = mapper.relationships[name]
+            # 关系两端关联用到的本表列
+            columns.update(mapper.get_property_by_column(column).key for column in relationship.local_columns)
+            loader = relation_loaders[name](getattr(model, name))
+            if children is not None:
+                target = relationship.mapper
+                names = {target.get_property_by_column(column).key for column in target.primary_key}
+                names.update(child for child in children if child in target.column_attrs)
+                loader = loader.load_only(*(getattr(target.class_, child) for child in sorted(names)))
+            options.append(loader)
+    columns.update(mapper.get_property_by_column(column).key for column in mapper.primary_key)
+    options.insert(0, load_only(*(getattr(model, name) for name in sorted(columns))))
+    return options
@@ -0,0 +1,51 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from pwdlib import PasswordHash
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 哈希线程数：Argon2 计算期间释放GIL，线程即可并行占用多个CPU核
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 线程全忙时最多排队的哈希任务数，超出时直接返回429
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", str(HASH_WORKERS * 8)))
+
+# 密码加密上下文；参数调整后，旧哈希会在下次登录时自动升级
+pwd_hash = PasswordHash.recommended()
+
+# 专用于密码哈希的线程池，与处理数据库调用的默认线程池隔离
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="password-hash")
+
+# 已提交（执行中 + 排队中）的哈希任务数，只在事件循环线程中修改
+_pending = 0
+
+
+async def _run(fn, *args):
+    """在哈希线程池中执行，超过容量时返回429，不让登录请求无限堆积"""
+    global _pending
+    if _pending >= HASH_WORKERS + HASH_QUEUE_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many concurrent authentication requests",
+            headers={"Retry-After": "1"},
+        )
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    """计算密码哈希"""
+    return await _run(pwd_hash.hash, password)
+
+
+async def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """验证密码；哈希参数已过时时同时返回按当前参数重新计算的哈希，否则为None"""
+    return await _run(pwd_hash.verify_and_update, password, hashed_password)
+
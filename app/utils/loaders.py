@@ -0,0 +1,88 @@
+from typing import Iterable, Optional
+from sqlalchemy import Select, select
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from app.models.post import Post
+from app.models.comment import Comment
+from app.models.tag import Tag
+from app.models.user import User
+from app.utils.fields import FieldSelection, field_load_options
+
+# 统一的关系预加载策略，避免序列化时逐行懒加载（N+1）：
+# 多对一的作者随主查询 JOIN 取回，多对多的标签用一次 IN 查询批量取回。
+# 异步会话不支持隐式懒加载，序列化用到的关系都必须在这里预加载。
+
+# 按字段投影加载时各关系的加载方式，与上述策略一致
+POST_RELATION_LOADERS = {"author": joinedload, "tags": selectinload}
+COMMENT_RELATION_LOADERS = {"author": joinedload}
+
+
+def post_load_options():
+    """文章的预加载选项：作者 + 标签"""
+    return (joinedload(Post.author), selectinload(Post.tags))
+
+
+def post_list_load_options():
+    """文章列表项（PostListItem）的加载选项：只取列表展示的列，不读取正文"""
+    return (
+        load_only(
+            Post.id,
+            Post.title,
+            Post.summary,
+            Post.author_id,
+            Post.created_at,
+            Post.published_at,
+            Post.comment_count,
+            Post.last_commented_at,
+        ),
+        joinedload(Post.author).load_only(User.id, User.username, User.full_name),
+        selectinload(Post.tags).load_only(Tag.id, Tag.name),
+    )
+
+
+def comment_load_options():
+    """评论的预加载选项：作者"""
+    return (joinedload(Comment.author),)
+
+
+def post_fields_load_options(selection: FieldSelection, required: Iterable[str] = ("created_at",)):
+    """按字段选择（fields 参数）加载文章：只读取所选的列与关系，默认附带分页游标用到的 created_at"""
+    return field_load_options(Post, selection, POST_RELATION_LOADERS, required)
+
+
+def comment_fields_load_options(selection: FieldSelection):
+    """按字段选择加载评论，附带组装评论串和分页游标用到的 parent_id、created_at"""
+    return field_load_options(Comment, selection, COMMENT_RELATION_LOADERS, ("parent_id", "created_at"))
+
+
+def with_post_relations(statement: Select) -> Select:
+    """为文章查询附加预加载选项"""
+    return statement.options(*post_load_options())
+
+
+def with_post_list_relations(statement: Select) -> Select:
+    """为文章列表查询附加精简加载选项"""
+    return statement.options(*post_list_load_options())
+
+
+def with_comment_relations(statement: Select) -> Select:
+    """为评论查询附加预加载选项"""
+    return statement.options(*comment_load_options())
+
+
+async def load_post(db, post_id: int, options: Optional[Iterable] = None) -> Optional[Post]:
+    """按ID加载文章及其关系，可传入其他加载选项；写操作后调用时会刷新会话中已有的对象"""
+    statement = (
+        select(Post)
+        .options(*(options or post_load_options()))
+        .where(Post.id == post_id)
+        .execution_options(populate_existing=True)
+    )
+    return (await db.execute(statement)).scalars().first()
+
+
+async def load_comment(db, comment_id: int) -> Optional[Comment]:
+    """按ID加载评论及其作者；写操作后调用时会刷新会话中已有的对象"""
+    statement = (
+        with_comment_relations(select(Comment)).where(Comment.id == comment_id).execution_options(populate_existing=True)
+    )
+    return (await db.execute(statement)).scalars().first()
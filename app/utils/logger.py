@@ -0,0 +1,137 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# 日志文件及轮转：单个文件最大字节数与保留的旧文件数
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# json：每行一个JSON对象，便于采集；text：便于本地阅读
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# 同一位置的重复日志在窗口（秒）内最多输出的条数，其余只计数，0表示不采样
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "5"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord 自带的属性，其余属性视为 extra 字段写入JSON
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """将日志记录格式化为单行JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in data:
+                data[key] = value
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RepeatSampler(logging.Filter):
+    """重复日志采样
+
+    以 (logger, 级别, 消息模板, 异常类型) 区分日志来源，每个来源在一个窗口内最多放行
+    burst 条，其余丢弃；窗口结束后的第一条附带 suppressed 字段记录被丢弃的条数。
+    例如Redis不可用时每个请求都会记录同一条警告，采样后日志量不随请求量增长。
+    """
+
+    def __init__(self, window: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.clock = clock
+        # 来源 -> [窗口开始时间, 已放行条数, 已丢弃条数]
+        self._seen: Dict[Tuple, list] = {}
+        # 同步模式下线程池中的数据库操作也会记录日志
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.name, record.levelno, str(record.msg), exc_type)
+        now = self.clock()
+        with self._lock:
+            state = self._seen.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                if len(self._seen) > 10000:
+                    self._seen.clear()
+                self._seen[key] = [now, 1, 0]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+            return False
+
+
+class StructuredQueueHandler(logging.handlers.QueueHandler):
+    """入队前只展开消息参数和异常堆栈，保留记录的其他字段，交给监听线程中的格式化器处理"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            # 异常对象可能引用请求中的大量对象，不随记录进入队列
+            record.exc_info = None
+        return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging() -> None:
+    """配置根日志：记录只放入内存队列，由后台线程写文件和标准输出，不阻塞事件循环"""
+    global _listener
+    if _listener is not None:
+        return
+
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    stream_handler = logging.StreamHandler()
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = StructuredQueueHandler(log_queue)
+    # 在入队之前采样，被丢弃的记录不再格式化异常堆栈
+    if LOG_SAMPLE_WINDOW > 0:
+        queue_handler.addFilter(RepeatSampler(LOG_SAMPLE_WINDOW, LOG_SAMPLE_BURST))
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+    _listener.start()
+    # 进程退出时写完队列中剩余的日志
+    atexit.register(_listener.stop)
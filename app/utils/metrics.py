@@ -0,0 +1,226 @@
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from dotenv import load_dotenv
+from sqlalchemy import event
+
+# 加载环境变量
+load_dotenv()
+
+# 是否采集请求指标并开放 /metrics；关闭时不安装中间件和任何钩子
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# 请求耗时（秒）与单个请求SQL条数的直方图桶上界
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 未匹配任何路由的请求归为一类，避免任意路径造成标签数量膨胀
+UNMATCHED_ROUTE = "unmatched"
+
+
+class RequestStats:
+    """单个请求内的数据库与Redis调用统计"""
+
+    __slots__ = ("queries", "query_time", "redis_calls", "redis_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.redis_calls = 0
+        self.redis_time = 0.0
+
+
+# 当前请求的统计；同步模式下数据库操作在线程池中执行，也能读到同一个对象
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    """Prometheus 标签文本"""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+class Metrics:
+    """进程内指标，按 Prometheus 文本格式导出
+
+    只在事件循环线程中汇总（请求结束时一次写入），无需加锁；多worker部署时每个worker各自统计。
+    """
+
+    def __init__(self):
+        # (method, route, status) -> 请求耗时
+        self.latency: Dict[Tuple[str, str, str], Histogram] = {}
+        # (method, route) -> 单个请求的SQL条数
+        self.query_counts: Dict[Tuple[str, str], Histogram] = {}
+        # (method, route) -> [SQL条数, SQL耗时, Redis调用次数, Redis耗时]
+        self.totals: Dict[Tuple[str, str], List[float]] = {}
+        # (namespace, result) -> 次数
+        self.cache: Dict[Tuple[str, str], int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, duration: float, stats: RequestStats) -> None:
+        key = (method, route)
+        histogram = self.latency.get((method, route, str(status)))
+        if histogram is None:
+            histogram = self.latency[(method, route, str(status))] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(duration)
+        if key not in self.query_counts:
+            self.query_counts[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.totals[key] = [0, 0.0, 0, 0.0]
+        self.query_counts[key].observe(stats.queries)
+        totals = self.totals[key]
+        totals[0] += stats.queries
+        totals[1] += stats.query_time
+        totals[2] += stats.redis_calls
+        totals[3] += stats.redis_time
+
+    def record_cache(self, namespace: str, result: str) -> None:
+        """记录一次缓存读取，result 为 hit、stale 或 miss"""
+        key = (namespace, result)
+        self.cache[key] = self.cache.get(key, 0) + 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+
+        def histogram(name: str, help_text: str, series: Dict[tuple, Histogram], label_names: Sequence[str]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for label_values, hist in sorted(series.items()):
+                labels = dict(zip(label_names, label_values))
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(**labels, le=str(bound))} {cumulative}")
+                lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {hist.count}')
+                lines.append(f"{name}_sum{_labels(**labels)} {hist.sum}")
+                lines.append(f"{name}_count{_labels(**labels)} {hist.count}")
+
+        def counter(name: str, help_text: str, values: Dict[tuple, float], label_names: Sequence[str]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for label_values, value in sorted(values.items()):
+                lines.append(f"{name}{_labels(**dict(zip(label_names, label_values)))} {value}")
+
+        route_labels = ("method", "route")
+        histogram(
+            "http_request_duration_seconds", "Request latency by route.", self.latency, ("method", "route", "status")
+        )
+        histogram("http_request_db_queries", "SQL statements per request by route.", self.query_counts, route_labels)
+        for index, (name, help_text) in enumerate(
+            (
+                ("db_queries_total", "SQL statements executed by route."),
+                ("db_query_seconds_total", "Time spent executing SQL by route."),
+                ("redis_commands_total", "Redis round trips (commands or pipelines) by route."),
+                ("redis_command_seconds_total", "Time spent waiting on Redis by route."),
+            )
+        ):
+            counter(name, help_text, {key: totals[index] for key, totals in self.totals.items()}, route_labels)
+        counter(
+            "cache_requests_total", "Response cache lookups by namespace and result.", self.cache, ("namespace", "result")
+        )
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """记录每个请求的耗时、SQL与Redis调用（ASGI中间件）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - started
+            _current.reset(token)
+            # 路由匹配后 scope 中带有路由对象，使用路径模板而不是实际路径
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            metrics.observe_request(scope["method"], route, status_code, duration, stats)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info["metrics_query_started"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.pop("metrics_query_started", None)
+    if stats is not None and started is not None:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - started
+
+
+def instrument_engine(engine) -> None:
+    """统计引擎执行的SQL；异步引擎传入其 sync_engine"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class InstrumentedPipeline(Pipeline):
+    """一次 execute 计为一次Redis往返"""
+
+    async def execute(self, raise_on_error: bool = True):
+        stats = _current.get()
+        if stats is None:
+            return await super().execute(raise_on_error)
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            stats.redis_calls += 1
+            stats.redis_time += time.perf_counter() - started
+
+
+class InstrumentedRedis(redis.Redis):
+    """统计每个请求内的Redis命令次数与耗时"""
+
+    async def execute_command(self, *args, **options):
+        stats = _current.get()
+        if stats is None:
+            return await super().execute_command(*args, **options)
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            stats.redis_calls += 1
+            stats.redis_time += time.perf_counter() - started
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
@@ -0,0 +1,55 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import tuple_
+
+# 下一页游标通过响应头返回，保持列表响应体结构不变
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: Any, item_id: int) -> str:
+    """将 (created_at, id) 编码为不透明游标"""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, item_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标，格式错误时返回400"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_filter(query, created_at_column, id_column, cursor: str):
+    """按 (created_at, id) 降序的键集条件，取游标之后的记录"""
+    created_at, item_id = decode_cursor(cursor)
+    return query.filter(tuple_(created_at_column, id_column) < tuple_(created_at, item_id))
+
+
+def next_cursor(items: Sequence[Any], limit: int) -> Optional[str]:
+    """根据当前页最后一条记录生成下一页游标，不满一页时返回None"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last.created_at, last.id)
+
+
+def next_cursor_headers(items: Sequence[Any], limit: int) -> Dict[str, str]:
+    """下一页游标响应头，可随缓存的响应一起保存"""
+    cursor = next_cursor(items, limit)
+    return {NEXT_CURSOR_HEADER: cursor} if cursor else {}
+
+
+def set_next_cursor(response: Response, items: Sequence[Any], limit: int) -> None:
+    """在响应头中写入下一页游标"""
+    cursor = next_cursor(items, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,38 @@
+from typing import Iterable, List, Optional
+from app.utils.redis import RedisCache, CacheKeys
+
+
+def list_page_references(posts: Iterable, tag_id: Optional[int] = None) -> List[str]:
+    """列表页或检索结果引用的对象：页中的文章，以及按标签筛选时的标签"""
+    references = [CacheKeys.post_ref(post.id) for post in posts]
+    if tag_id:
+        references.append(CacheKeys.tag_ref(tag_id))
+    return references
+
+
+async def invalidate_post_detail(post_id: int) -> None:
+    """文章或其评论统计变化：清除文章详情缓存（含各字段投影）
+
+    详情条目引用该文章，先写入变更标记，变化前开始、尚未写入的详情（包括列表页顺带预热的）
+    据此丢弃，不会在删除之后写回旧内容；引用了该文章的列表页一并清除。
+    """
+    await RedisCache.invalidate_references([CacheKeys.post_ref(post_id)])
+    await RedisCache.delete(CacheKeys.post_detail(post_id))
+    await RedisCache.invalidate(CacheKeys.post_fields_namespace(post_id))
+
+
+async def invalidate_post_lists() -> None:
+    """已发布文章的集合变化（发布、撤回、删除）：所有列表页和检索结果都可能变化，整体失效"""
+    await RedisCache.invalidate(CacheKeys.POST_LIST)
+    await RedisCache.invalidate(CacheKeys.POST_SEARCH)
+
+
+async def invalidate_post_pages(changed_tag_ids: Iterable[int] = (), text_changed: bool = False) -> None:
+    """已发布文章的内容变化：包含该文章的列表页已由 invalidate_post_detail 清除，这里清除其余受影响的页
+
+    标签变化时，按这些标签筛选的列表成员随之变化，清除这些标签的全部列表页；
+    标题、摘要或正文变化时，任意检索的结果都可能变化，检索结果整体失效。
+    """
+    await RedisCache.invalidate_references(CacheKeys.tag_ref(tag_id) for tag_id in changed_tag_ids)
+    if text_changed:
+        await RedisCache.invalidate(CacheKeys.POST_SEARCH)
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+from dotenv import load_dotenv
+from sqlalchemy import select
+from app.models.post import Post
+from app.utils.database import db_session
+from app.utils.redis import BackgroundWorker, redis_client
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 现存文章ID位图：第 id 位为1表示该文章存在
+POST_INDEX_KEY = "posts:live"
+# 第0位（文章ID从1开始）作为“已完整构建”标记，位图被淘汰或尚未构建时为0
+READY_BIT = 0
+# 定期从数据库重建位图的间隔（秒），修正Redis写入失败等造成的偏差；0表示只在启动时构建
+POST_INDEX_REBUILD_INTERVAL = int(os.getenv("POST_INDEX_REBUILD_INTERVAL", "3600"))
+# Redis位图的最大偏移量（PostgreSQL的Integer主键不会超过）
+MAX_POST_ID = 2**32 - 1
+
+
+class PostIndex:
+    """文章存在性索引
+
+    用Redis位图记录现存文章的ID，由 create_post / delete_post 同步维护，
+    评论接口据此判断文章是否存在而无需查询数据库。位图未构建或Redis不可用时
+    contains 返回None，调用方回退到数据库查询。
+    """
+
+    async def contains(self, post_id: int) -> Optional[bool]:
+        """文章是否存在；无法确定时返回None"""
+        if post_id <= 0 or post_id > MAX_POST_ID:
+            return False
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.getbit(POST_INDEX_KEY, READY_BIT)
+            pipe.getbit(POST_INDEX_KEY, post_id)
+            ready, exists = await pipe.execute()
+        except Exception as e:
+            logger.warning("Post index check error: %s", e)
+            return None
+        if not ready:
+            return None
+        return bool(exists)
+
+    async def add(self, post_id: int) -> None:
+        """记录新文章，须在事务提交之后调用"""
+        await self._set(post_id, 1)
+
+    async def remove(self, post_id: int) -> None:
+        """移除已删除的文章，须在事务提交之后调用"""
+        await self._set(post_id, 0)
+
+    async def _set(self, post_id: int, value: int) -> None:
+        try:
+            await redis_client.setbit(POST_INDEX_KEY, post_id, value)
+        except Exception as e:
+            logger.warning("Post index update error: %s", e)
+            # 漏记的文章会被误判为不存在，清除标记使读取回退到数据库，等待下次重建
+            try:
+                await redis_client.setbit(POST_INDEX_KEY, READY_BIT, 0)
+            except Exception:
+                pass
+
+    async def rebuild(self, db) -> int:
+        """从数据库重建位图，返回文章数
+
+        先在临时键中构建完整位图，再用 RENAME 原子替换，读取方不会看到半成品。
+        构建期间提交的新建和删除只写到了旧位图，替换后再查询一次文章ID，按差异补记和清除。
+        """
+        ids = set((await db.scalars(select(Post.id))).all())
+        max_id = max(ids, default=0)
+        # Redis位图中偏移量0对应首字节的最高位
+        bits = bytearray(max_id // 8 + 1)
+        for post_id in (READY_BIT, *ids):
+            bits[post_id >> 3] |= 0x80 >> (post_id & 7)
+        building_key = f"{POST_INDEX_KEY}:building"
+        await redis_client.set(building_key, bytes(bits))
+        await redis_client.rename(building_key, POST_INDEX_KEY)
+
+        # add / remove 在事务提交之后调用：写入旧位图的变更，其事务已在此次查询之前提交
+        current = set((await db.scalars(select(Post.id))).all())
+        if current != ids:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for post_id in current - ids:
+                    pipe.setbit(POST_INDEX_KEY, post_id, 1)
+                for post_id in ids - current:
+                    pipe.setbit(POST_INDEX_KEY, post_id, 0)
+                await pipe.execute()
+        return len(current)
+
+
+post_index = PostIndex()
+
+
+class PostIndexSync(BackgroundWorker):
+    """启动时构建文章存在性索引（已由其他worker构建时跳过），之后定期重建"""
+
+    name = "post-index-sync"
+
+    def __init__(self, interval: int):
+        super().__init__()
+        self.interval = interval
+
+    async def run(self) -> None:
+        try:
+            built = bool(await redis_client.getbit(POST_INDEX_KEY, READY_BIT))
+        except Exception as e:
+            logger.warning("Post index check error: %s", e)
+            built = False
+        while True:
+            if not built:
+                try:
+                    # 从主库读取，避免副本延迟漏掉刚创建的文章
+                    async with db_session() as db:
+                        count = await post_index.rebuild(db)
+                    logger.info("Post index rebuilt with %d posts", count)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error("Post index rebuild error: %s", e)
+                    await asyncio.sleep(5)
+                    continue
+            if self.interval <= 0:
+                return
+            await asyncio.sleep(self.interval)
+            built = False
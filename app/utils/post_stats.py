@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import os
+from typing import Iterable, Optional, Set
+from dotenv import load_dotenv
+from sqlalchemy import case, func, or_, select, update
+from app.models.post import Post
+from app.models.comment import Comment
+from app.models.tag import Tag, PostTag
+from app.utils.database import db_session
+from app.utils.redis import BackgroundWorker
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 后台校正评论统计的间隔（秒），0表示不启用，可改为定时执行 python -m app.utils.post_stats
+POST_STATS_RECONCILE_INTERVAL = int(os.getenv("POST_STATS_RECONCILE_INTERVAL", "0"))
+# 每批校正的文章ID范围，避免一次更新锁住整张表
+POST_STATS_BATCH_SIZE = int(os.getenv("POST_STATS_BATCH_SIZE", "1000"))
+
+
+def _visible_comments(post_id):
+    """文章的可见评论（递归CTE）：有效且所有上级评论都有效
+
+    与评论串的展示一致，上级评论被删除时其下的回复一并隐藏，不计入统计。
+    post_id 为文章ID或 Post.id（关联到外层的文章），CTE 嵌套在子查询中，每篇文章只遍历自己的评论。
+    """
+    visible = (
+        select(Comment.id, Comment.created_at)
+        .where(Comment.post_id == post_id, Comment.parent_id.is_(None), Comment.is_active == True)
+        .correlate(Post)
+        .cte("visible_comments", recursive=True, nesting=True)
+    )
+    return visible.union_all(
+        select(Comment.id, Comment.created_at)
+        .join(visible, Comment.parent_id == visible.c.id)
+        .where(Comment.is_active == True)
+    )
+
+
+def _visible_stats(post_id=Post.id):
+    """文章的可见评论数与最新一条可见评论的时间（标量子查询）"""
+    count = select(func.count()).select_from(_visible_comments(post_id)).scalar_subquery()
+    last = select(func.max(_visible_comments(post_id).c.created_at)).scalar_subquery()
+    return count, last
+
+
+async def record_comment_added(db, post_id: int) -> None:
+    """新增评论后更新文章统计，须在插入评论写入（flush）之后、同一事务中执行
+
+    回复的上级评论本身有效、但更上层的评论已被删除时，新回复同样不可见，因此按可见评论重新计算，而不是加1。
+    """
+    count, last = _visible_stats(post_id)
+    await db.execute(update(Post).where(Post.id == post_id).values(comment_count=count, last_commented_at=last))
+
+
+async def record_comment_removed(db, post_id: int) -> None:
+    """评论被软删除后更新文章统计，须在 is_active 变更写入（flush）之后、同一事务中执行
+
+    删除的评论连同其下被隐藏的回复一起从统计中扣除，因此按该文章的可见评论重新计算，而不是减1。
+    """
+    count, last = _visible_stats(post_id)
+    await db.execute(update(Post).where(Post.id == post_id).values(comment_count=count, last_commented_at=last))
+
+
+def published_tag_ids(is_published: bool, tags: Iterable[Tag]) -> Set[int]:
+    """文章计入标签文章数的标签ID，只统计已发布文章"""
+    return {tag.id for tag in tags} if is_published else set()
+
+
+async def record_post_tags_changed(db, old_tag_ids: Set[int], new_tag_ids: Set[int]) -> bool:
+    """文章的标签或发布状态变化后增量更新标签文章数，须与文章修改在同一事务中执行；返回是否有标签计数变化"""
+    added = new_tag_ids - old_tag_ids
+    removed = old_tag_ids - new_tag_ids
+    if added:
+        await db.execute(update(Tag).where(Tag.id.in_(added)).values(post_count=Tag.post_count + 1))
+    if removed:
+        await db.execute(
+            update(Tag)
+            .where(Tag.id.in_(removed))
+            .values(post_count=case((Tag.post_count > 0, Tag.post_count - 1), else_=0))
+        )
+    return bool(added or removed)
+
+
+async def reconcile_tag_counts(db) -> int:
+    """按关联表重新计算各标签的已发布文章数，返回修正的标签数；标签数量有限，一条语句完成"""
+    actual_count = (
+        select(func.count())
+        .select_from(PostTag.join(Post, Post.id == PostTag.c.post_id))
+        .where(PostTag.c.tag_id == Tag.id, Post.is_published == True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Tag)
+        .where(Tag.post_count != actual_count)
+        .values(post_count=actual_count)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def reconcile_post_stats(db, batch_size: int = POST_STATS_BATCH_SIZE) -> int:
+    """按评论表重新计算所有文章的统计（只统计可见评论），只更新不一致的行，返回修正的文章数"""
+    actual_count, actual_last = _visible_stats()
+    max_id: Optional[int] = await db.scalar(select(func.max(Post.id)))
+    fixed = 0
+    for start in range(0, (max_id or 0) + 1, batch_size):
+        result = await db.execute(
+            update(Post)
+            .where(
+                Post.id >= start,
+                Post.id < start + batch_size,
+                or_(Post.comment_count != actual_count, Post.last_commented_at.is_distinct_from(actual_last)),
+            )
+            .values(comment_count=actual_count, last_commented_at=actual_last)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        fixed += result.rowcount
+    return fixed
+
+
+class PostStatsReconciler(BackgroundWorker):
+    """定期校正评论统计与标签文章数，修复并发修改、异常中断等原因造成的偏差"""
+
+    name = "post-stats-reconciler"
+
+    def __init__(self, interval: int):
+        super().__init__()
+        self.interval = interval
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                async with db_session() as db:
+                    fixed = await reconcile_post_stats(db)
+                    fixed_tags = await reconcile_tag_counts(db)
+                if fixed:
+                    logger.warning("Reconciled comment stats for %d posts", fixed)
+                if fixed_tags:
+                    logger.warning("Reconciled post counts for %d tags", fixed_tags)
+            except Exception as e:
+                logger.error("Post stats reconcile error: %s", e)
+
+
+async def _main() -> None:
+    async with db_session() as db:
+        fixed = await reconcile_post_stats(db)
+        fixed_tags = await reconcile_tag_counts(db)
+    print(f"Reconciled comment stats for {fixed} posts, post counts for {fixed_tags} tags")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,90 +1,795 @@
-import redis
+import redis.asyncio as redis
+import asyncio
+import abc
 import json
-from typing import Optional, Any
+import logging
+import time
+import uuid
+from typing import Optional, Any, Awaitable, Callable, Iterable, List, Dict, Set, Tuple
 from dotenv import load_dotenv
 import os
+from app.utils.compression import COMPRESSION_MIN_SIZE
+from app.utils.database import DB_REPLICA_MAX_LAG, READ_DATABASE_URL, db_session, read_session
+from app.utils.local_cache import LocalCache
+from app.utils.metrics import METRICS_ENABLED, InstrumentedRedis, metrics
+from app.utils.serializers import CachedResponse
 
 # 加载环境变量
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # Redis配置
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# 连接池：每个worker最多持有的连接数，连接耗尽时最多等待的秒数
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "1"))
+# 单次命令与建立连接的超时（秒），Redis异常时尽快回退到数据库
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+# 旧版本缓存键的后台清理间隔（秒），0表示不启用，旧键依赖TTL过期
+CACHE_SWEEP_INTERVAL = int(os.getenv("CACHE_SWEEP_INTERVAL", "0"))
+# 进程内一级缓存容量（字节）与最长存活时间（秒），任一为0时不启用
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", str(32 * 1024 * 1024)))
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", "30"))
+# 软过期后仍可返回旧值的时长（秒），期间由一个worker在后台刷新
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "60"))
+# 缓存重建锁的超时（秒），也是其他worker等待重建结果的最长时间
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "5"))
+# 跨进程失效通知频道
+CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+# 仅当锁仍由自己持有（值为自己的令牌）时删除
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+# 对象变更标记的保留时长（秒），须长于一次缓存重建的耗时；重建期间对象发生变化的结果不写入缓存
+REFERENCE_MARKER_TTL = 60
+# 比较变更标记与重建开始时间时容忍的多机时钟偏差（秒）
+REFERENCE_CLOCK_SKEW = 1.0
+
+# 创建异步Redis客户端，值以原始字节读写，响应缓存命中时无需解码即可返回；
+# 连接耗尽时排队等待而不是立即报错，空闲连接定期做健康检查；启用指标时统计每个请求的Redis调用
+redis_pool = redis.BlockingConnectionPool.from_url(
+    REDIS_URL,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_TIMEOUT,
+    health_check_interval=30,
+)
+redis_client = (InstrumentedRedis if METRICS_ENABLED else redis.Redis)(connection_pool=redis_pool)
+
+# 进程内一级缓存，位于Redis之前；通过失效通知与其他worker保持一致
+local_cache = LocalCache(CACHE_L1_MAX_BYTES, CACHE_L1_TTL)
+
+# 当前进程标识，用于忽略自己发出的失效通知
+INSTANCE_ID = uuid.uuid4().hex
+
+
+# 缓存重建函数：接收数据库会话，返回要缓存的响应；返回None表示结果不可缓存
+Loader = Callable[[Any], Awaitable[Optional[CachedResponse]]]
+
+
+async def close_redis() -> None:
+    """关闭连接池中的连接，应用退出时调用"""
+    await redis_client.connection_pool.disconnect()
 
-# 创建Redis客户端
-redis_client = redis.from_url(REDIS_URL, decode_responses=True)
 
 class RedisCache:
-    """Redis缓存类"""
-    
+    """Redis缓存类
+
+    读取顺序为 进程内缓存(L1) -> Redis(L2)。删除键或使命名空间失效时，
+    通过 pub/sub 通知其他worker清除各自的一级缓存。批量读写使用 MGET 和
+    pipeline，一次往返处理多个键。
+    """
+
+    # Redis层命中统计
+    l2_hits = 0
+    l2_misses = 0
+
+    # 本进程内正在重建的键：(结果, 是否等待其他worker的重建结果)，同一个键的并发请求共享一次重建
+    _inflight: Dict[str, Tuple[asyncio.Future, bool]] = {}
+    # 后台刷新任务（保持引用直到完成）
+    _refreshing: Set[asyncio.Task] = set()
+
     @staticmethod
-    def set(key: str, value: Any, expire: int = 3600) -> bool:
+    async def set(key: str, value: Any, expire: int = 3600) -> bool:
         """设置缓存"""
         try:
+            raw = value
             if not isinstance(value, (str, int, float, bool)):
-                value = json.dumps(value)
-            redis_client.setex(key, expire, value)
+                raw = json.dumps(value)
+            await redis_client.setex(key, expire, raw)
+            local_cache.set(key, value, len(str(raw)), ttl=expire)
             return True
         except Exception as e:
-            print(f"Redis set error: {e}")
+            logger.warning("Redis set error: %s", e)
             return False
-    
+
     @staticmethod
-    def get(key: str) -> Optional[Any]:
+    async def get(key: str) -> Optional[Any]:
         """获取缓存"""
+        value = local_cache.get(key)
+        if value is not None:
+            RedisCache._record(key, "hit")
+            return value
         try:
-            value = redis_client.get(key)
-            if value:
-                try:
-                    return json.loads(value)
-                except json.JSONDecodeError:
-                    return value
+            raw = await redis_client.get(key)
+        except Exception as e:
+            logger.warning("Redis get error: %s", e)
             return None
+        if not raw:
+            RedisCache.l2_misses += 1
+            RedisCache._record(key, "miss")
+            return None
+        RedisCache.l2_hits += 1
+        RedisCache._record(key, "hit")
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw.decode()
+        local_cache.set(key, value, len(raw))
+        return value
+
+    @staticmethod
+    async def set_response(
+        key: str, response: CachedResponse, expire: int = 3600, since: Optional[float] = None
+    ) -> bool:
+        """缓存最终响应（JSON字节及响应头），同时保存预先压缩的版本
+
+        响应带有 references 时一并写入反向索引；since 为生成该响应的查询开始时间，
+        其间引用的对象发生过变化时响应可能已过期，不保留在缓存中。
+        """
+        await RedisCache._compress([response])
+        try:
+            if not response.references:
+                await redis_client.setex(key, expire, response.encode())
+            elif not await RedisCache._set_referenced(key, response, expire, since):
+                return False
+            local_cache.set(key, response, response.size, ttl=expire)
+            return True
         except Exception as e:
-            print(f"Redis get error: {e}")
+            logger.warning("Redis set error: %s", e)
+            return False
+
+    @staticmethod
+    async def _compress(responses: Iterable[CachedResponse]) -> None:
+        """在线程池中计算压缩版本，压缩大响应体时不阻塞事件循环；过小不压缩的响应不切换线程"""
+        pending = [response for response in responses if len(response.body) >= COMPRESSION_MIN_SIZE]
+        if pending:
+            await asyncio.to_thread(lambda: [response.compress() for response in pending])
+
+    @staticmethod
+    async def _set_referenced(key: str, response: CachedResponse, expire: int, since: Optional[float]) -> bool:
+        """写入条目及其反向索引，再检查引用对象的变更标记
+
+        顺序保证与 invalidate_references 并发时不会留下过期条目：失效方先写标记再读取索引，
+        写入方先登记索引、写入条目再读取标记，二者至少有一方能看到对方的写入。
+        """
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for ref in response.references:
+                pipe.sadd(CacheKeys.references(ref), key)
+                pipe.expire(CacheKeys.references(ref), expire)
+            pipe.setex(key, expire, response.encode())
+            pipe.mget([CacheKeys.reference_changed(ref) for ref in response.references])
+            markers = (await pipe.execute())[-1]
+        if RedisCache._changed_since(response.references, markers, since):
+            await RedisCache.delete(key)
+            return False
+        return True
+
+    @staticmethod
+    def _changed_since(refs: List[str], markers: List[Optional[bytes]], since: Optional[float]) -> Set[str]:
+        """变更标记晚于 since（允许 REFERENCE_CLOCK_SKEW 的时钟偏差）的引用对象"""
+        if since is None:
+            return set()
+        return {
+            ref for ref, marker in zip(refs, markers)
+            if marker is not None and float(marker) >= since - REFERENCE_CLOCK_SKEW
+        }
+
+    @staticmethod
+    async def get_response(key: str) -> Optional[CachedResponse]:
+        """获取缓存的响应，命中时可直接返回给客户端"""
+        response = local_cache.get(key)
+        if response is not None:
+            return response
+        try:
+            raw = await redis_client.get(key)
+        except Exception as e:
+            logger.warning("Redis get error: %s", e)
             return None
-    
+        if not raw:
+            RedisCache.l2_misses += 1
+            return None
+        RedisCache.l2_hits += 1
+        response = CachedResponse.decode(raw)
+        local_cache.set(key, response, response.size)
+        return response
+
     @staticmethod
-    def delete(key: str) -> bool:
+    async def get_many_responses(keys: Iterable[str]) -> Dict[str, CachedResponse]:
+        """批量获取缓存的响应：先查一级缓存，其余键用一次 MGET 取回；只返回命中的键"""
+        found = {}
+        missing = []
+        for key in keys:
+            response = local_cache.get(key)
+            if response is not None:
+                found[key] = response
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+        try:
+            values = await redis_client.mget(missing)
+        except Exception as e:
+            logger.warning("Redis mget error: %s", e)
+            return found
+        for key, raw in zip(missing, values):
+            if not raw:
+                RedisCache.l2_misses += 1
+                continue
+            RedisCache.l2_hits += 1
+            response = CachedResponse.decode(raw)
+            local_cache.set(key, response, response.size)
+            found[key] = response
+        return found
+
+    @staticmethod
+    async def set_many_responses(
+        responses: Dict[str, CachedResponse], expire: int = 3600, stale_ttl: int = 0, since: Optional[float] = None
+    ) -> bool:
+        """批量缓存响应，所有 SETEX 在一个 pipeline 中一次发送
+
+        stale_ttl 大于0时，条目 expire 秒后软过期，再保留 stale_ttl 秒供 get_or_load 返回旧值。
+        带有 references 的响应与 set_response 相同：登记反向索引，since 之后引用对象
+        发生过变化的条目写入后随即删除。
+        """
+        if not responses:
+            return True
+        if stale_ttl:
+            fresh_until = time.time() + expire
+            for response in responses.values():
+                response.fresh_until = fresh_until
+            expire += stale_ttl
+        await RedisCache._compress(responses.values())
+        refs = sorted({ref for response in responses.values() for ref in response.references})
+        try:
+            # 顺序与 _set_referenced 相同：先登记索引、写入条目，最后读取变更标记
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, response in responses.items():
+                    for ref in response.references:
+                        pipe.sadd(CacheKeys.references(ref), key)
+                        pipe.expire(CacheKeys.references(ref), expire)
+                    pipe.setex(key, expire, response.encode())
+                if refs:
+                    pipe.mget([CacheKeys.reference_changed(ref) for ref in refs])
+                results = await pipe.execute()
+        except Exception as e:
+            logger.warning("Redis pipeline set error: %s", e)
+            return False
+        changed = RedisCache._changed_since(refs, results[-1], since) if refs else set()
+        for key, response in responses.items():
+            if changed.intersection(response.references):
+                await RedisCache.delete(key)
+            else:
+                local_cache.set(key, response, response.size, ttl=expire)
+        return True
+
+    @staticmethod
+    async def get_or_load(
+        key: str, load: Loader, db: Any, expire: int, stale_ttl: int = CACHE_STALE_TTL
+    ) -> Optional[CachedResponse]:
+        """读取缓存，未命中时只重建一次（single-flight）
+
+        条目在 expire 秒内视为新鲜；之后的 stale_ttl 秒内仍直接返回旧值，
+        同时由一个worker在后台用独立会话刷新。缓存缺失时，本进程内的并发请求
+        等待同一次重建，其他worker通过Redis锁等待重建结果而不是各自查询数据库。
+        load 抛出的异常会传递给所有等待者。
+        """
+        cached = await RedisCache.get_response(key)
+        if cached is not None:
+            if cached.is_stale:
+                RedisCache._record(key, "stale")
+                RedisCache._refresh_in_background(key, load, expire, stale_ttl)
+            else:
+                RedisCache._record(key, "hit")
+            return cached
+        RedisCache._record(key, "miss")
+        return await RedisCache._load_once(key, lambda: RedisCache._rebuild(load, db), expire, stale_ttl, wait=True)
+
+    @staticmethod
+    async def _rebuild(load: Loader, db: Any) -> Optional[CachedResponse]:
+        """重建缓存条目；刚有写入时副本可能尚未同步，改用主库会话，避免旧数据写入刚失效的缓存"""
+        if await RedisCache._recently_written():
+            async with db_session() as primary:
+                return await load(primary)
+        return await load(db)
+
+    @staticmethod
+    def _mark_write(pipe: Any) -> None:
+        """在失效操作的 pipeline 中记录一次写入（配置了只读副本时）"""
+        if READ_DATABASE_URL:
+            pipe.set(CacheKeys.RECENT_WRITE, "1", px=int(DB_REPLICA_MAX_LAG * 1000))
+
+    @staticmethod
+    async def _recently_written() -> bool:
+        """最近 DB_REPLICA_MAX_LAG 秒内是否有过写入；未配置副本时无需判断"""
+        if not READ_DATABASE_URL:
+            return False
+        try:
+            return bool(await redis_client.exists(CacheKeys.RECENT_WRITE))
+        except Exception as e:
+            logger.warning("Redis get error: %s", e)
+            return False
+
+    @staticmethod
+    async def _load_once(
+        key: str, load: Callable[[], Awaitable[Optional[CachedResponse]]], expire: int, stale_ttl: int, wait: bool
+    ) -> Optional[CachedResponse]:
+        """进程内合并同一个键的并发重建"""
+        inflight = RedisCache._inflight.get(key)
+        if inflight is not None:
+            future, shared_wait = inflight
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 只有重建方被取消时才自行重建，自身被取消则继续向上抛出
+                if not future.cancelled():
+                    raise
+            else:
+                # 后台刷新（wait=False）未取得Redis锁时返回None，并不表示结果不可缓存，需要结果的请求自行重建
+                if result is not None or shared_wait or not wait:
+                    return result
+        future = asyncio.get_running_loop().create_future()
+        RedisCache._inflight[key] = (future, wait)
+        try:
+            result = await RedisCache._load_locked(key, load, expire, stale_ttl, wait)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            if RedisCache._inflight.get(key, (None, None))[0] is future:
+                del RedisCache._inflight[key]
+
+    @staticmethod
+    async def _load_locked(
+        key: str, load: Callable[[], Awaitable[Optional[CachedResponse]]], expire: int, stale_ttl: int, wait: bool
+    ) -> Optional[CachedResponse]:
+        """跨进程合并重建：持有Redis锁的worker负责重建，其他worker等待其结果"""
+        lock_key = CacheKeys.lock(key)
+        token = uuid.uuid4().hex
+        try:
+            locked = await redis_client.set(lock_key, token, nx=True, px=int(CACHE_LOCK_TIMEOUT * 1000))
+        except Exception as e:
+            logger.warning("Redis lock error: %s", e)
+            locked = True  # Redis不可用时直接查询数据库
+            token = None
+        if not locked:
+            if not wait:
+                return None
+            cached = await RedisCache._wait_for(key, lock_key)
+            if cached is not None:
+                return cached
+            # 重建方超时或结果不可缓存，自行查询
+        try:
+            started = time.time()
+            response = await load()
+            if response is not None:
+                response.fresh_until = time.time() + expire
+                await RedisCache.set_response(key, response, expire=expire + stale_ttl, since=started)
+            return response
+        finally:
+            if locked and token is not None:
+                await RedisCache._release_lock(lock_key, token)
+
+    @staticmethod
+    async def _wait_for(key: str, lock_key: str, interval: float = 0.05) -> Optional[CachedResponse]:
+        """轮询等待其他worker写入重建结果；锁已释放仍无结果（不可缓存）或超时时返回None"""
+        deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(interval)
+            cached = await RedisCache.get_response(key)
+            if cached is not None:
+                return cached
+            try:
+                if not await redis_client.exists(lock_key):
+                    return None
+            except Exception as e:
+                logger.warning("Redis lock check error: %s", e)
+                return None
+        return None
+
+    @staticmethod
+    async def _release_lock(lock_key: str, token: str) -> None:
+        """仅释放自己持有的锁；锁已超时被他人获取时保留"""
+        try:
+            # 比较与删除须是一次原子操作，否则两步之间锁可能超时并被其他worker获取
+            await redis_client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        except Exception as e:
+            logger.warning("Redis unlock error: %s", e)
+
+    @staticmethod
+    def _refresh_in_background(key: str, load: Loader, expire: int, stale_ttl: int) -> None:
+        """软过期后在后台刷新条目，请求结束后会话已关闭，因此使用独立会话"""
+        if key in RedisCache._inflight:
+            return
+
+        async def load_with_own_session():
+            # 刚有写入时从主库读取，原因同 _rebuild
+            session = db_session if await RedisCache._recently_written() else read_session
+            async with session() as db:
+                return await load(db)
+
+        async def refresh():
+            try:
+                await RedisCache._load_once(key, load_with_own_session, expire, stale_ttl, wait=False)
+            except Exception as e:
+                logger.warning("Cache refresh error for %s: %s", key, e)
+
+        task = asyncio.create_task(refresh())
+        RedisCache._refreshing.add(task)
+        task.add_done_callback(RedisCache._refreshing.discard)
+
+    @staticmethod
+    async def delete(key: str) -> bool:
         """删除缓存"""
+        local_cache.delete(key)
+        try:
+            await redis_client.delete(key)
+            await RedisCache._publish_invalidation(key)
+            return True
+        except Exception as e:
+            logger.warning("Redis delete error: %s", e)
+            return False
+
+    @staticmethod
+    def _record(key: str, result: str) -> None:
+        """按命名空间统计缓存读取结果（启用指标时）"""
+        if METRICS_ENABLED:
+            metrics.record_cache(CacheKeys.namespace_of(key), result)
+
+    @staticmethod
+    def stats() -> Dict[str, Dict[str, int]]:
+        """各层缓存的命中统计"""
+        return {
+            "l1": local_cache.stats(),
+            "l2": {"hits": RedisCache.l2_hits, "misses": RedisCache.l2_misses},
+        }
+
+    @staticmethod
+    async def _publish_invalidation(key: str) -> None:
+        """通知其他worker清除一级缓存中的键"""
+        if local_cache.enabled:
+            await redis_client.publish(CACHE_INVALIDATION_CHANNEL, f"{INSTANCE_ID} {key}")
+
+    @staticmethod
+    async def get_version(namespace: str) -> int:
+        """获取命名空间当前版本号，优先读取一级缓存"""
+        version_key = CacheKeys.version(namespace)
+        version = local_cache.get(version_key)
+        if version is not None:
+            return version
         try:
-            redis_client.delete(key)
+            version = int(await redis_client.get(version_key) or 0)
+        except Exception as e:
+            logger.warning("Redis get version error: %s", e)
+            return 0
+        local_cache.set(version_key, version, len(version_key))
+        return version
+
+    @staticmethod
+    async def invalidate(namespace: str) -> bool:
+        """使命名空间失效：版本号自增一次，旧版本的缓存键不再被读取，随TTL自然过期"""
+        version_key = CacheKeys.version(namespace)
+        try:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                # 先记录写入，读到新版本号的重建一定能看到该标记
+                RedisCache._mark_write(pipe)
+                pipe.incr(version_key)
+                version = (await pipe.execute())[-1]
+            local_cache.set(version_key, version, len(version_key))
+            await RedisCache._publish_invalidation(version_key)
             return True
         except Exception as e:
-            print(f"Redis delete error: {e}")
+            logger.warning("Redis invalidate error: %s", e)
             return False
-    
+
     @staticmethod
-    def delete_pattern(pattern: str) -> bool:
-        """删除匹配模式的缓存"""
+    async def invalidate_references(refs: Iterable[str]) -> bool:
+        """定点失效：删除反向索引中引用了这些对象的缓存条目，其他条目不受影响
+
+        先写入变更标记，正在重建、尚未登记索引的条目在写入时据此发现自己已过期。
+        """
+        refs = list(refs)
+        if not refs:
+            return True
         try:
-            keys = redis_client.keys(pattern)
-            if keys:
-                redis_client.delete(*keys)
+            async with redis_client.pipeline(transaction=True) as pipe:
+                RedisCache._mark_write(pipe)
+                for ref in refs:
+                    pipe.set(CacheKeys.reference_changed(ref), repr(time.time()), ex=REFERENCE_MARKER_TTL)
+                for ref in refs:
+                    pipe.smembers(CacheKeys.references(ref))
+                    pipe.delete(CacheKeys.references(ref))
+                results = await pipe.execute()
+            keys = {key.decode() for members in results[-2 * len(refs)::2] for key in members}
+            if not keys:
+                return True
+            for key in keys:
+                local_cache.delete(key)
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(*keys)
+                if local_cache.enabled:
+                    for key in keys:
+                        pipe.publish(CACHE_INVALIDATION_CHANNEL, f"{INSTANCE_ID} {key}")
+                await pipe.execute()
             return True
         except Exception as e:
-            print(f"Redis delete pattern error: {e}")
+            logger.warning("Redis invalidate references error: %s", e)
             return False
 
+    @staticmethod
+    async def sweep_stale(pattern: str, batch_size: int = 500) -> int:
+        """用SCAN增量清理旧版本的缓存键，返回删除数量；仅用于后台回收内存，不影响正确性"""
+        deleted = 0
+        try:
+            batch = []
+            async for key in redis_client.scan_iter(match=f"{pattern}:v*", count=batch_size):
+                batch.append(key.decode())
+                if len(batch) >= batch_size:
+                    deleted += await RedisCache._delete_stale(batch)
+                    batch = []
+            if batch:
+                deleted += await RedisCache._delete_stale(batch)
+        except Exception as e:
+            logger.warning("Redis sweep error: %s", e)
+        return deleted
+
+    @staticmethod
+    async def _delete_stale(keys: List[str]) -> int:
+        """删除一批键中版本号落后于命名空间当前版本的键"""
+        namespaces = {}
+        for key in keys:
+            namespace, _, rest = key.partition(":v")
+            version = rest.split(":", 1)[0]
+            if version.isdigit():
+                namespaces.setdefault(namespace, []).append((key, int(version)))
+        if not namespaces:
+            return 0
+        names = list(namespaces)
+        current = await redis_client.mget([CacheKeys.version(name) for name in names])
+        stale = [
+            key
+            for name, version in zip(names, current)
+            for key, key_version in namespaces[name]
+            if key_version < int(version or 0)
+        ]
+        if stale:
+            await redis_client.unlink(*stale)
+        return len(stale)
+
+
+class BackgroundWorker(abc.ABC):
+    """在事件循环中运行的后台任务，随应用生命周期启动和停止；子类实现 run"""
+
+    name = "background-worker"
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self.run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    @abc.abstractmethod
+    async def run(self) -> None:
+        """任务主循环，由 start 在事件循环中启动"""
+
+
+class CacheSweeper(BackgroundWorker):
+    """后台缓存清理任务，按固定间隔清理各版本化命名空间中的旧键"""
+
+    name = "cache-sweeper"
+
+    def __init__(self, interval: int):
+        super().__init__()
+        self.interval = interval
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            for pattern in CacheKeys.VERSIONED_PATTERNS:
+                await RedisCache.sweep_stale(pattern)
+
+
+class CacheInvalidationListener(BackgroundWorker):
+    """订阅失效通知，清除本进程一级缓存中对应的键"""
+
+    name = "cache-invalidation-listener"
+
+    async def run(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # 订阅建立前可能错过通知，清空一级缓存重新开始
+                local_cache.clear()
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message:
+                        sender, _, key = message["data"].decode().partition(" ")
+                        if sender != INSTANCE_ID:
+                            local_cache.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Redis invalidation listener error: %s", e)
+                # 断线期间无法收到通知，丢弃一级缓存后稍后重连
+                local_cache.clear()
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+
 # 缓存键生成器
 class CacheKeys:
-    """缓存键生成类"""
-    
+    """缓存键生成类
+
+    列表类缓存按命名空间分代：键中嵌入命名空间的版本号，失效时只需将版本号自增，
+    无需查找并删除旧键。
+    """
+
+    # 文章列表命名空间
+    POST_LIST = "post:list"
+
+    # 文章检索结果（含带检索词的列表）命名空间；文章正文变化可能改变任意检索的结果，单独失效
+    POST_SEARCH = "post:search"
+
+    # 标签列表（含标签云）命名空间
+    TAG_LIST = "tag:list"
+
+    # 最近写入标记：DB_REPLICA_MAX_LAG 秒内有过写入时存在，期间的缓存重建从主库读取
+    RECENT_WRITE = "cache:recent-write"
+
+    # 需要后台清理的版本化命名空间匹配模式
+    VERSIONED_PATTERNS = (POST_LIST, POST_SEARCH, TAG_LIST, "comments:*", "principal:*", "post:fields:*")
+
+    @staticmethod
+    def namespace_of(key: str) -> str:
+        """缓存键所属的命名空间（用于指标），不含文章ID、用户名等高基数部分"""
+        for namespace in (
+            CacheKeys.POST_LIST,
+            CacheKeys.POST_SEARCH,
+            CacheKeys.TAG_LIST,
+            "post:detail",
+            "post:fields",
+            "comments",
+            "principal",
+        ):
+            if key.startswith(f"{namespace}:"):
+                return namespace
+        return key.split(":", 1)[0]
+
+    @staticmethod
+    def version(namespace: str) -> str:
+        """命名空间版本号键"""
+        return f"cache:version:{namespace}"
+
+    @staticmethod
+    def lock(key: str) -> str:
+        """缓存重建锁键"""
+        return f"lock:{key}"
+
+    @staticmethod
+    def post_ref(post_id: int) -> str:
+        """反向索引中的文章引用"""
+        return f"post:{post_id}"
+
+    @staticmethod
+    def tag_ref(tag_id: int) -> str:
+        """反向索引中的标签筛选引用"""
+        return f"tag:{tag_id}"
+
+    @staticmethod
+    def references(ref: str) -> str:
+        """反向索引键：引用了该对象的缓存键集合"""
+        return f"cache:refs:{ref}"
+
     @staticmethod
-    def post_list(skip: int, limit: int, tag_id: Optional[int] = None, search: Optional[str] = None) -> str:
-        """文章列表缓存键"""
-        return f"post:list:{skip}:{limit}:{tag_id or 'all'}:{search or 'none'}"
-    
+    def reference_changed(ref: str) -> str:
+        """对象最近一次变更的时间标记"""
+        return f"cache:changed:{ref}"
+
+    @staticmethod
+    def principal_namespace(username: str) -> str:
+        """用户身份缓存命名空间"""
+        return f"principal:{username}"
+
+    @staticmethod
+    def principal(username: str, version: int, jti: str) -> str:
+        """已认证用户缓存键"""
+        return f"{CacheKeys.principal_namespace(username)}:v{version}:{jti}"
+
+    @staticmethod
+    def comments_namespace(post_id: int) -> str:
+        """文章评论命名空间"""
+        return f"comments:{post_id}"
+
+    @staticmethod
+    def post_list(
+        version: int,
+        skip: int,
+        limit: int,
+        tag_id: Optional[int] = None,
+        search: Optional[str] = None,
+        cursor: Optional[str] = None,
+        view: str = "compact",
+        fields: Optional[str] = None,
+    ) -> str:
+        """文章列表缓存键，精简与完整两种视图、每种字段投影（规范化的 fields）分别缓存
+
+        带检索词的列表归入检索结果命名空间，version 为对应命名空间的版本号。
+        """
+        namespace = CacheKeys.POST_SEARCH if search else CacheKeys.POST_LIST
+        projection = f"fields={fields}" if fields else view
+        return (
+            f"{namespace}:v{version}:{projection}:{skip}:{limit}:"
+            f"{tag_id or 'all'}:{search or 'none'}:{cursor or 'start'}"
+        )
+
+    @staticmethod
+    def post_search(version: int, search: str, skip: int, limit: int) -> str:
+        """文章检索缓存键"""
+        return f"{CacheKeys.POST_SEARCH}:v{version}:{skip}:{limit}:{search.strip().lower()}"
+
     @staticmethod
     def post_detail(post_id: int) -> str:
         """文章详情缓存键"""
         return f"post:detail:{post_id}"
-    
+
+    @staticmethod
+    def post_fields_namespace(post_id: int) -> str:
+        """文章详情字段投影命名空间，文章或其评论统计变化时与详情缓存一并失效"""
+        return f"post:fields:{post_id}"
+
     @staticmethod
-    def tag_list() -> str:
+    def post_detail_fields(version: int, post_id: int, fields: str) -> str:
+        """按字段投影的文章详情缓存键，fields 为规范化的字段选择"""
+        return f"{CacheKeys.post_fields_namespace(post_id)}:v{version}:{fields}"
+
+    @staticmethod
+    def tag_list(version: int, skip: int, limit: int) -> str:
         """标签列表缓存键"""
-        return "tag:list"
-    
+        return f"{CacheKeys.TAG_LIST}:v{version}:{skip}:{limit}"
+
+    @staticmethod
+    def tag_cloud(version: int) -> str:
+        """标签云缓存键，归入标签列表命名空间以便一并失效"""
+        return f"{CacheKeys.TAG_LIST}:v{version}:cloud"
+
     @staticmethod
-    def comments(post_id: int, skip: int, limit: int) -> str:
-        """评论列表缓存键"""
-        return f"comments:{post_id}:{skip}:{limit}"
+    def comments(
+        version: int, post_id: int, skip: int, limit: int, cursor: Optional[str] = None, fields: Optional[str] = None
+    ) -> str:
+        """评论串列表缓存键，每种字段投影分别缓存"""
+        key = f"{CacheKeys.comments_namespace(post_id)}:v{version}:{skip}:{limit}:{cursor or 'start'}"
+        return f"{key}:fields={fields}" if fields else key
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import time
+from dotenv import load_dotenv
+from fastapi import HTTPException, status
+from app.utils.bloom import BloomFilter
+from app.utils.redis import BackgroundWorker, redis_client
+
+# 加载环境变量
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# 已吊销令牌：有序集合，成员为 jti，分数为令牌过期时间，过期后即可清除
+REVOKED_TOKENS_KEY = "auth:revoked"
+# 吊销通知频道，各worker据此更新本地布隆过滤器
+REVOCATION_CHANNEL = "auth:revoked"
+# 布隆过滤器预期容量与误判率，误判时再到Redis确认
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+# 定期重建过滤器的间隔（秒），丢弃已过期令牌
+REVOCATION_REBUILD_INTERVAL = int(os.getenv("REVOCATION_REBUILD_INTERVAL", "3600"))
+
+
+class RevocationList:
+    """令牌吊销列表
+
+    以Redis有序集合为准，每个worker在内存中保存一份布隆过滤器副本。
+    绝大多数令牌未被吊销，过滤器判定“不在”即可放行，无需任何网络往返；
+    只有判定“可能在”时才到Redis确认。过滤器尚未从Redis加载时每次都查询Redis。
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filter = BloomFilter(capacity, error_rate)
+        self.ready = False
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        """吊销令牌，返回False表示该令牌此前已被吊销（可用于刷新令牌的一次性校验）"""
+        try:
+            added = await redis_client.zadd(REVOKED_TOKENS_KEY, {jti: expires_at}, nx=True)
+            await redis_client.publish(REVOCATION_CHANNEL, jti)
+        except Exception as e:
+            logger.error("Token revocation error: %s", e)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token revocation unavailable")
+        self._filter.add(jti)
+        return bool(added)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """检查令牌是否已被吊销
+
+        Redis不可用时：过滤器已就绪且判定“可能在”，按已吊销处理（拒绝而不是放行已注销的令牌）；
+        过滤器尚未就绪时无从判断，放行并记录日志。
+        """
+        if self.ready and jti not in self._filter:
+            return False
+        try:
+            return await redis_client.zscore(REVOKED_TOKENS_KEY, jti) is not None
+        except Exception as e:
+            logger.warning("Token revocation check error: %s", e)
+            return self.ready
+
+    def add_local(self, jti: str) -> None:
+        """记录其他worker发出的吊销通知"""
+        self._filter.add(jti)
+
+    async def reload(self) -> None:
+        """从Redis重建过滤器，同时清除已过期的吊销记录"""
+        now = time.time()
+        await redis_client.zremrangebyscore(REVOKED_TOKENS_KEY, "-inf", now)
+        members = await redis_client.zrangebyscore(REVOKED_TOKENS_KEY, now, "+inf")
+        bloom = BloomFilter(max(self.capacity, len(members) * 2), self.error_rate)
+        for member in members:
+            bloom.add(member.decode())
+        self._filter = bloom
+        self.ready = True
+
+
+revoked_tokens = RevocationList(REVOCATION_BLOOM_CAPACITY, REVOCATION_BLOOM_ERROR_RATE)
+
+
+class RevocationSync(BackgroundWorker):
+    """订阅吊销通知并定期重建本进程的布隆过滤器"""
+
+    name = "token-revocation-sync"
+
+    async def run(self) -> None:
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                # 先订阅再加载，加载期间发生的吊销会在之后的消息中补上
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                await revoked_tokens.reload()
+                rebuild_at = time.monotonic() + REVOCATION_REBUILD_INTERVAL
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    if message:
+                        revoked_tokens.add_local(message["data"].decode())
+                    if time.monotonic() >= rebuild_at:
+                        await revoked_tokens.reload()
+                        rebuild_at = time.monotonic() + REVOCATION_REBUILD_INTERVAL
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Token revocation sync error: %s", e)
+                # 断线期间可能错过通知，恢复前改为逐个查询Redis
+                revoked_tokens.ready = False
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,138 @@
+import html
+import re
+from typing import List, Tuple
+from sqlalchemy import and_, case, func, literal_column, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.post import Post, SEARCH_CONFIG
+from app.utils.loaders import with_post_relations
+
+# 高亮片段配置
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxWords=35, MinWords=15, MaxFragments=2"
+
+# 子串匹配时高亮片段取首个命中位置前后的字符数
+SNIPPET_CONTEXT = 60
+
+# 与生成列使用同一检索配置
+_REGCONFIG = literal_column(f"'{SEARCH_CONFIG}'::regconfig")
+
+# 中日韩文字：simple 配置只按空白和标点切词，连续的汉字整段作为一个词，检索其中的词语无法命中；
+# 含这些文字的检索改用 pg_trgm 三元组索引上的子串匹配
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+# 正文中需要转义的HTML字符，& 须最先替换
+_HTML_ESCAPES = (("&", "&amp;"), ("<", "&lt;"), (">", "&gt;"), ('"', "&quot;"), ("'", "&#x27;"))
+
+# 子串匹配的相关度：与检索向量的权重对应，标题命中最高，其次摘要、正文
+_SUBSTRING_WEIGHTS = ((Post.title, 1.0), (Post.summary, 0.4), (Post.content, 0.2))
+
+
+def is_cjk(search: str) -> bool:
+    """检索词是否包含中日韩文字"""
+    return _CJK.search(search) is not None
+
+
+def to_tsquery(search: str):
+    """将用户输入转换为 tsquery，支持引号短语、OR 与 -排除 等网页搜索语法"""
+    return func.websearch_to_tsquery(_REGCONFIG, search)
+
+
+def match_filter(search: str):
+    """检索条件：全文检索可命中 search_vector 上的 GIN 索引，含中日韩文字时改为子串匹配"""
+    if is_cjk(search):
+        return _substring_filter(search.split())
+    return Post.search_vector.op("@@")(to_tsquery(search))
+
+
+def _like_pattern(term: str) -> str:
+    """包含 term 的 LIKE 模式，以 / 转义其中的通配符"""
+    escaped = term.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
+
+def _substring_filter(terms: List[str]):
+    """每个检索词都须出现在标题、摘要或正文中（不区分大小写）"""
+    return and_(
+        *(
+            or_(*(column.ilike(_like_pattern(term), escape="/") for column, _ in _SUBSTRING_WEIGHTS))
+            for term in terms
+        )
+    )
+
+
+def _substring_rank(terms: List[str]):
+    """子串匹配的相关度：各检索词在各字段中命中的权重之和"""
+    return sum(
+        case((column.ilike(_like_pattern(term), escape="/"), weight), else_=0.0)
+        for term in terms
+        for column, weight in _SUBSTRING_WEIGHTS
+    )
+
+
+def _escape_html(column):
+    """在数据库中对正文做HTML转义，生成的高亮片段中只有 <mark> 是标记"""
+    for char, entity in _HTML_ESCAPES:
+        column = func.replace(column, char, entity)
+    return column
+
+
+def _highlight(text: str, terms: List[str]) -> str:
+    """截取首个命中位置附近的正文，转义HTML后用 <mark> 包裹各检索词"""
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    match = pattern.search(text)
+    start = max(0, match.start() - SNIPPET_CONTEXT) if match else 0
+    end = match.end() + SNIPPET_CONTEXT if match else 2 * SNIPPET_CONTEXT
+    excerpt = text[start:end]
+
+    parts = []
+    last = 0
+    for found in pattern.finditer(excerpt):
+        parts.append(html.escape(excerpt[last:found.start()]))
+        parts.append(f"<mark>{html.escape(found.group())}</mark>")
+        last = found.end()
+    parts.append(html.escape(excerpt[last:]))
+    return "".join(parts)
+
+
+async def search_posts(db: AsyncSession, search: str, skip: int, limit: int) -> List[Tuple[Post, float, str]]:
+    """按相关度检索已发布文章，返回 (文章, 相关度, 高亮片段) 列表"""
+    if is_cjk(search):
+        return await _search_substring(db, search.split(), skip, limit)
+
+    tsquery = to_tsquery(search)
+    rank = func.ts_rank(Post.search_vector, tsquery).label("rank")
+
+    # 先在索引上完成匹配、排序与分页，只对当前页生成高亮片段
+    page = (
+        select(Post.id.label("id"), rank)
+        .where(Post.is_published == True, Post.search_vector.op("@@")(tsquery))
+        .order_by(rank.desc(), Post.created_at.desc(), Post.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .subquery()
+    )
+    # 正文先转义再高亮，片段可直接嵌入页面而不会执行正文中的HTML
+    snippet = func.ts_headline(_REGCONFIG, _escape_html(Post.content), tsquery, HEADLINE_OPTIONS).label("snippet")
+
+    statement = (
+        with_post_relations(select(Post, page.c.rank, snippet))
+        .join(page, page.c.id == Post.id)
+        .order_by(page.c.rank.desc(), Post.created_at.desc(), Post.id.desc())
+    )
+    rows = (await db.execute(statement)).all()
+    return [(post, float(post_rank), post_snippet) for post, post_rank, post_snippet in rows]
+
+
+async def _search_substring(
+    db: AsyncSession, terms: List[str], skip: int, limit: int
+) -> List[Tuple[Post, float, str]]:
+    """含中日韩文字的检索：按子串匹配，不支持网页搜索语法，高亮片段在应用中生成"""
+    rank = _substring_rank(terms).label("rank")
+    statement = (
+        with_post_relations(select(Post, rank))
+        .where(Post.is_published == True, _substring_filter(terms))
+        .order_by(rank.desc(), Post.created_at.desc(), Post.id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    rows = (await db.execute(statement)).all()
+    return [(post, float(post_rank), _highlight(post.content, terms)) for post, post_rank in rows]
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+from fastapi import Request, Response, status
+from pydantic import TypeAdapter
+from app.utils.compression import compress_variants, negotiate_encoding
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    """每个响应模型只构建一次 TypeAdapter"""
+    return TypeAdapter(schema)
+
+
+def render_json(schema: Any, obj: Any) -> bytes:
+    """按响应模型校验ORM对象并直接编码为最终JSON字节
+
+    缓存未命中时的响应和写入缓存的内容都由这里生成，命中时原样返回，
+    不再经过 FastAPI 的 response_model 校验和二次编码。
+    """
+    adapter = _adapter(schema)
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+
+def join_json_array(items: List[bytes]) -> bytes:
+    """将逐个编码的元素拼接为JSON数组，结果与整体编码一致，元素字节可另行缓存"""
+    return b"[" + b",".join(items) + b"]"
+
+
+def compute_etag(body: bytes) -> str:
+    """响应体的强ETag"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀"""
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+def _not_modified_since(header: str, last_modified: Optional[str]) -> bool:
+    """Last-Modified 只精确到秒，同一秒内内容可能已被修改并重新生成，因此须早于 If-Modified-Since"""
+    if not last_modified:
+        return False
+    try:
+        return parsedate_to_datetime(last_modified) < parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+
+
+class CachedResponse:
+    """可缓存的最终响应：JSON字节 + 需要一并返回的响应头
+
+    新建时计算响应体的ETag并记录生成时间作为 Last-Modified，二者随条目一起缓存，
+    命中缓存时处理条件请求无需重新序列化或哈希。
+    fresh_until 为软过期时间（Unix时间戳），过后条目仍可返回，但应在后台刷新。
+    variants 为预先压缩的响应体（压缩格式 -> 字节），写入缓存时计算，命中时按
+    Accept-Encoding 直接返回，不再逐次压缩。
+    references 为响应内容涉及的对象（如 post:1、tag:2），写入缓存时记入反向索引，
+    这些对象变化时只清除引用了它们的条目；不随条目保存。
+    """
+
+    def __init__(
+        self,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+        fresh_until: Optional[float] = None,
+        variants: Optional[Dict[str, bytes]] = None,
+        references: Iterable[str] = (),
+    ):
+        self.body = body
+        self.headers = headers or {}
+        self.fresh_until = fresh_until
+        self.variants = variants or {}
+        self.references = tuple(references)
+        # 旧格式的缓存条目没有校验信息，解码时补上
+        if "ETag" not in self.headers:
+            self.headers["ETag"] = compute_etag(body)
+        if "Last-Modified" not in self.headers:
+            self.headers["Last-Modified"] = formatdate(time.time(), usegmt=True)
+
+    @property
+    def is_stale(self) -> bool:
+        return self.fresh_until is not None and time.time() >= self.fresh_until
+
+    def compress(self) -> None:
+        """计算各压缩版本，写入缓存前调用；已计算过时跳过"""
+        if not self.variants:
+            self.variants = compress_variants(self.body)
+
+    def encode(self) -> bytes:
+        """编码为缓存值：首行为 [响应头, 软过期时间, {压缩格式: 字节数}] JSON，
+        其后依次为响应体和各压缩版本"""
+        meta = [self.headers, self.fresh_until, {encoding: len(data) for encoding, data in self.variants.items()}]
+        return b"".join(
+            (json.dumps(meta, separators=(",", ":")).encode(), b"\n", self.body, *self.variants.values())
+        )
+
+    @classmethod
+    def decode(cls, raw: bytes) -> "CachedResponse":
+        header, _, body = raw.partition(b"\n")
+        meta = json.loads(header)
+        # 兼容只保存响应头的旧格式
+        if isinstance(meta, dict):
+            return cls(body, meta)
+        if len(meta) == 2:
+            headers, fresh_until = meta
+            return cls(body, headers, fresh_until)
+        headers, fresh_until, lengths = meta
+        # 压缩版本依次位于响应体之后
+        end = len(body) - sum(lengths.values())
+        variants, offset = {}, end
+        for encoding, length in lengths.items():
+            variants[encoding] = body[offset:offset + length]
+            offset += length
+        return cls(body[:end], headers, fresh_until, variants)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(data) for data in self.variants.values())
+
+    def is_not_modified(self, request: Request, etag: str) -> bool:
+        """条件请求的校验值与当前内容一致；同时带有 If-None-Match 时忽略 If-Modified-Since"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return _etag_matches(if_none_match, etag)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None:
+            return _not_modified_since(if_modified_since, self.headers.get("Last-Modified"))
+        return False
+
+    def to_response(self, request: Optional[Request] = None, cache_control: Optional[str] = None) -> Response:
+        """生成响应
+
+        传入请求时按 Accept-Encoding 选择预先压缩的版本，内容未变化时返回不带响应体的304。
+        压缩版本是不同的表示，使用各自的强ETag。
+        """
+        headers = dict(self.headers)
+        if cache_control:
+            headers["Cache-Control"] = cache_control
+        if request is None:
+            return Response(content=self.body, media_type="application/json", headers=headers)
+
+        body = self.body
+        if self.variants:
+            headers["Vary"] = "Accept-Encoding"
+            encoding = negotiate_encoding(request.headers.get("accept-encoding"), self.variants)
+            if encoding is not None:
+                body = self.variants[encoding]
+                headers["Content-Encoding"] = encoding
+                headers["ETag"] = f'{headers["ETag"][:-1]}-{encoding}"'
+        if self.is_not_modified(request, headers["ETag"]):
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
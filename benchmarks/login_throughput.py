@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+登录吞吐量基准测试
+
+在持续的读请求负载下并发登录，统计登录吞吐量、429次数以及读请求延迟，
+用于观察密码哈希是否拖慢同一worker上的其他请求。需要先启动服务，例如：
+
+    uvicorn main:app --workers 1
+    python benchmarks/login_throughput.py --base-url http://localhost:8000 --duration 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+USERNAME = "benchuser"
+PASSWORD = "benchpassword"
+
+
+async def ensure_user(client: httpx.AsyncClient) -> None:
+    """注册压测用户，已存在时忽略"""
+    await client.post(
+        "/api/auth/register",
+        json={"username": USERNAME, "email": f"{USERNAME}@example.com", "password": PASSWORD},
+    )
+
+
+async def login_worker(client: httpx.AsyncClient, deadline: float, stats: dict) -> None:
+    while time.monotonic() < deadline:
+        response = await client.post("/api/auth/login", data={"username": USERNAME, "password": PASSWORD})
+        if response.status_code == 200:
+            stats["ok"] += 1
+        elif response.status_code == 429:
+            stats["rejected"] += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", "1")))
+        else:
+            stats["errors"] += 1
+
+
+async def read_worker(client: httpx.AsyncClient, deadline: float, latencies: list) -> None:
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        await client.get("/api/posts/", params={"limit": 10})
+        latencies.append(time.perf_counter() - started)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+async def main(args) -> None:
+    limits = httpx.Limits(max_connections=args.logins + args.readers)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30) as client:
+        await ensure_user(client)
+
+        login_stats = {"ok": 0, "rejected": 0, "errors": 0}
+        latencies = []
+        deadline = time.monotonic() + args.duration
+        await asyncio.gather(
+            *(login_worker(client, deadline, login_stats) for _ in range(args.logins)),
+            *(read_worker(client, deadline, latencies) for _ in range(args.readers)),
+        )
+
+    print(f"duration:        {args.duration}s, {args.logins} login / {args.readers} read clients")
+    print(f"logins/s:        {login_stats['ok'] / args.duration:.1f}")
+    print(f"logins rejected: {login_stats['rejected']} (429), errors: {login_stats['errors']}")
+    print(f"reads/s:         {len(latencies) / args.duration:.1f}")
+    if latencies:
+        print(
+            "read latency:    "
+            f"p50 {statistics.median(latencies) * 1000:.1f}ms, "
+            f"p95 {percentile(latencies, 0.95) * 1000:.1f}ms, "
+            f"p99 {percentile(latencies, 0.99) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login throughput under concurrent read load")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--logins", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--readers", type=int, default=32, help="concurrent read clients")
+    asyncio.run(main(parser.parse_args()))
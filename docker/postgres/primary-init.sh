@@ -0,0 +1,4 @@
+#!/bin/sh
+# 仅在主库数据目录首次初始化时执行：允许只读副本以流复制方式连接
+set -e
+echo "host replication all all md5" >> "$PGDATA/pg_hba.conf"
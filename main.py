@@ -1,15 +1,60 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import auth, users, posts, comments, tags
+from app.utils import database
 from app.utils.database import engine, Base
+from app.utils.metrics import METRICS_ENABLED, MetricsMiddleware, instrument_engine, metrics
 from app.utils.error_handler import global_exception_handler, custom_exception_handler, CustomException
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.redis import (
+    RedisCache,
+    CacheSweeper,
+    CacheInvalidationListener,
+    CACHE_SWEEP_INTERVAL,
+    close_redis,
+    local_cache,
+)
+from app.utils.revocation import RevocationSync
+from app.utils.post_index import PostIndexSync, POST_INDEX_REBUILD_INTERVAL
+from app.utils.post_stats import PostStatsReconciler, POST_STATS_RECONCILE_INTERVAL
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动和停止后台任务"""
+    # 令牌吊销列表的本地布隆过滤器同步
+    workers = [RevocationSync()]
+    # 文章存在性索引的构建与定期重建
+    workers.append(PostIndexSync(POST_INDEX_REBUILD_INTERVAL))
+    # 一级缓存的跨进程失效通知
+    if local_cache.enabled:
+        workers.append(CacheInvalidationListener())
+    # 可选的旧版本缓存清理任务
+    if CACHE_SWEEP_INTERVAL > 0:
+        workers.append(CacheSweeper(CACHE_SWEEP_INTERVAL))
+    # 可选的评论统计校正任务
+    if POST_STATS_RECONCILE_INTERVAL > 0:
+        workers.append(PostStatsReconciler(POST_STATS_RECONCILE_INTERVAL))
+    for worker in workers:
+        worker.start()
+    yield
+    for worker in workers:
+        await worker.stop()
+    await close_redis()
+
+
 # 创建FastAPI应用
 app = FastAPI(
-    title="Blog API", description="A personal blog backend API built with FastAPI and PostgreSQL", version="0.1.0"
+    title="Blog API",
+    description="A personal blog backend API built with FastAPI and PostgreSQL",
+    version="0.1.0",
+    lifespan=lifespan,
 )
 
 # 配置CORS
@@ -19,8 +64,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# 请求指标：耗时、SQL与Redis调用、各命名空间的缓存命中；关闭时不产生任何开销
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    for metered_engine in (database.engine, database.read_engine, database.async_engine, database.async_read_engine):
+        if metered_engine is not None:
+            instrument_engine(getattr(metered_engine, "sync_engine", metered_engine))
+
 # 注册异常处理器
 app.add_exception_handler(Exception, global_exception_handler)
 app.add_exception_handler(CustomException, custom_exception_handler)
@@ -41,3 +94,17 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/health/cache")
+def cache_stats():
+    """各层缓存命中统计（当前worker）"""
+    return RedisCache.stats()
+
+
+if METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint():
+        """Prometheus 格式的请求指标（当前worker）"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,11 @@
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+
+
+# 整个测试会话共用一个客户端：请求运行在同一事件循环中，
+# 异步数据库连接池和Redis连接可以在请求之间复用
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
@@ -1,12 +1,12 @@
-from fastapi.testclient import TestClient
-from main import app
-from app.utils.database import SessionLocal, engine, Base
-
-# 创建测试客户端
-client = TestClient(app)
+from sqlalchemy import select
+from pwdlib.hashers.argon2 import Argon2Hasher
+from tests.test_db import count_queries
+from app.models.user import User
+from app.utils import hashing, revocation
+from app.utils.database import SessionLocal
 
 # 测试注册功能
-def test_register():
+def test_register(client):
     response = client.post(
         "/api/auth/register",
         json={
@@ -23,7 +23,7 @@ def test_register():
     assert data["full_name"] == "Test User"
 
 # 测试登录功能
-def test_login():
+def test_login(client):
     response = client.post(
         "/api/auth/login",
         data={
@@ -35,3 +35,98 @@ def test_login():
     data = response.json()
     assert "access_token" in data
     assert data["token_type"] == "bearer"
+
+# 测试已认证用户缓存：重复请求不再查询用户表，修改资料后缓存失效
+def test_principal_cache(client):
+    response = client.post(
+        "/api/auth/login",
+        data={
+            "username": "testuser",
+            "password": "testpassword"
+        }
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+    with count_queries() as statements:
+        response = client.get("/api/users/me", headers=headers)
+    assert response.status_code == 200
+    assert statements == []
+
+    response = client.put("/api/users/me", headers=headers, json={"full_name": "Renamed User"})
+    assert response.status_code == 200
+    assert client.get("/api/users/me", headers=headers).json()["full_name"] == "Renamed User"
+
+    client.put("/api/users/me", headers=headers, json={"full_name": "Test User"})
+
+# 测试哈希参数变化后，登录时自动按新参数重新哈希
+def test_login_rehashes_outdated_password_hash(client):
+    outdated_hash = Argon2Hasher(time_cost=1, memory_cost=8192).hash("testpassword")
+    with SessionLocal() as db:
+        user = db.scalar(select(User).where(User.username == "testuser"))
+        user.password_hash = outdated_hash
+        db.commit()
+
+    response = client.post("/api/auth/login", data={"username": "testuser", "password": "testpassword"})
+    assert response.status_code == 200
+
+    with SessionLocal() as db:
+        user = db.scalar(select(User).where(User.username == "testuser"))
+        assert user.password_hash != outdated_hash
+        assert hashing.pwd_hash.verify_and_update("testpassword", user.password_hash) == (True, None)
+
+# 测试哈希线程池饱和时返回429
+def test_login_rejected_when_hash_pool_saturated(client, monkeypatch):
+    monkeypatch.setattr(hashing, "_pending", hashing.HASH_WORKERS + hashing.HASH_QUEUE_SIZE)
+    response = client.post("/api/auth/login", data={"username": "testuser", "password": "testpassword"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+# 测试刷新令牌：换取新令牌对，旧刷新令牌只能使用一次
+def test_refresh_token_rotation(client):
+    response = client.post("/api/auth/login", data={"username": "testuser", "password": "testpassword"})
+    tokens = response.json()
+    assert tokens["refresh_token"]
+
+    response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert refreshed["access_token"] != tokens["access_token"]
+    assert refreshed["refresh_token"] != tokens["refresh_token"]
+    headers = {"Authorization": f"Bearer {refreshed['access_token']}"}
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+
+    # 旧刷新令牌已轮换失效
+    response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+    # 访问令牌不能当作刷新令牌使用
+    response = client.post("/api/auth/refresh", json={"refresh_token": refreshed["access_token"]})
+    assert response.status_code == 401
+
+# 测试注销后访问令牌和刷新令牌都被吊销
+def test_logout_revokes_tokens(client):
+    tokens = client.post("/api/auth/login", data={"username": "testuser", "password": "testpassword"}).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/api/users/me", headers=headers).status_code == 200
+
+    response = client.post("/api/auth/logout", headers=headers, json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 204
+
+    assert client.get("/api/users/me", headers=headers).status_code == 401
+    response = client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+# 测试Redis不可用时：过滤器命中的令牌按已吊销处理，过滤器未就绪时放行
+def test_revocation_check_fails_closed_on_filter_hit(client, monkeypatch):
+    async def unavailable(*args, **kwargs):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(revocation.redis_client, "zscore", unavailable)
+    revoked = revocation.RevocationList(1000, 0.01)
+    revoked.add_local("revoked-jti")
+    revoked.ready = True
+    assert client.portal.call(revoked.is_revoked, "revoked-jti") is True
+    assert client.portal.call(revoked.is_revoked, "other-jti") is False
+    revoked.ready = False
+    assert client.portal.call(revoked.is_revoked, "revoked-jti") is False
@@ -0,0 +1,204 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from tests.test_db import count_queries
+from app.utils import database, redis as redis_module
+from app.utils.redis import RedisCache, CacheKeys
+from app.utils.serializers import CachedResponse
+
+# 并发请求数
+BURST_SIZE = 20
+
+
+# 获取访问令牌
+def get_access_token(client):
+    response = client.post(
+        "/api/auth/login",
+        data={
+            "username": "testuser",
+            "password": "testpassword"
+        }
+    )
+    return response.json()["access_token"]
+
+
+# 创建一篇已发布文章
+def create_post(client, title):
+    token = get_access_token(client)
+    response = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": title,
+            "content": "This is a test post for cache tests",
+            "is_published": True,
+            "tag_ids": []
+        }
+    )
+    return response.json()["id"]
+
+
+# 测试缓存失效后的突发请求只查询一次数据库
+def test_cache_miss_burst_queries_db_once(client):
+    create_post(client, "Test Post for Burst")
+
+    # 单个请求重建缓存需要的SQL语句数
+    with count_queries() as single:
+        client.get("/api/posts/", params={"skip": 0, "limit": 7})
+
+    # 另一个同样未缓存的分页，同时发起一批请求
+    with count_queries() as burst:
+        with ThreadPoolExecutor(max_workers=BURST_SIZE) as executor:
+            responses = list(executor.map(
+                lambda _: client.get("/api/posts/", params={"skip": 0, "limit": 8}),
+                range(BURST_SIZE)
+            ))
+
+    assert all(response.status_code == 200 for response in responses)
+    assert len({response.content for response in responses}) == 1
+    assert len(burst) == len(single)
+
+
+# 测试软过期后先返回旧值，再由后台刷新
+def test_stale_entry_served_while_refreshing(client):
+    post_id = create_post(client, "Test Post for Stale")
+    cache_key = CacheKeys.post_detail(post_id)
+
+    # 写入一个已软过期的旧条目
+    stale = CachedResponse(b'{"stale":true}', fresh_until=time.time() - 1)
+    client.portal.call(RedisCache.set_response, cache_key, stale, 60)
+
+    response = client.get(f"/api/posts/{post_id}")
+    assert response.json() == {"stale": True}
+
+    # 后台刷新完成后返回最新内容
+    for _ in range(50):
+        response = client.get(f"/api/posts/{post_id}")
+        if response.json() != {"stale": True}:
+            break
+        time.sleep(0.05)
+    assert response.json()["id"] == post_id
+
+
+# 测试缓存条目连同压缩版本一起编码，解码后内容不变
+def test_cached_response_variants_round_trip():
+    body = b'{"content":"' + b"compressible " * 200 + b'"}'
+    response = CachedResponse(body, {"X-Next-Cursor": "abc"})
+    response.compress()
+    assert "gzip" in response.variants
+    decoded = CachedResponse.decode(response.encode())
+    assert decoded.body == body
+    assert decoded.variants == response.variants
+    assert decoded.headers == response.headers
+    # 小响应不压缩
+    small = CachedResponse(b'{"id":1}')
+    small.compress()
+    assert small.variants == {}
+
+
+# 测试命中缓存时按 Accept-Encoding 返回预先压缩的响应体
+def test_compressed_cache_hit(client):
+    token = get_access_token(client)
+    post_id = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": "Test Post for Compression",
+            "content": "Long body that compresses well " * 200,
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+    client.get(f"/api/posts/{post_id}")
+
+    gzipped = client.get(f"/api/posts/{post_id}", headers={"Accept-Encoding": "gzip"})
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    assert gzipped.headers["Vary"] == "Accept-Encoding"
+    assert int(gzipped.headers["Content-Length"]) < len(gzipped.content)
+    assert gzipped.json()["id"] == post_id
+
+    plain = client.get(f"/api/posts/{post_id}", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in plain.headers
+    assert plain.content == gzipped.content
+    # 不同编码是不同的表示，ETag不同
+    assert plain.headers["ETag"] != gzipped.headers["ETag"]
+    response = client.get(
+        f"/api/posts/{post_id}", headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["ETag"]}
+    )
+    assert response.status_code == 304
+
+
+# 测试只释放自己持有的重建锁
+def test_release_lock_only_by_owner(client):
+    lock_key = CacheKeys.lock("post:detail:lock-test")
+    client.portal.call(redis_module.redis_client.set, lock_key, "other-token")
+    client.portal.call(RedisCache._release_lock, lock_key, "my-token")
+    assert client.portal.call(redis_module.redis_client.get, lock_key) == b"other-token"
+    client.portal.call(RedisCache._release_lock, lock_key, "other-token")
+    assert client.portal.call(redis_module.redis_client.exists, lock_key) == 0
+
+
+
+# 测试写入后的缓存重建从主库读取，而不是可能尚未同步的只读副本
+def test_rebuild_after_write_reads_primary(client, monkeypatch):
+    monkeypatch.setattr(redis_module, "READ_DATABASE_URL", "postgresql://replica")
+    client.portal.call(redis_module.redis_client.delete, CacheKeys.RECENT_WRITE)
+    replica = object()
+    sessions = []
+
+    async def load(session):
+        sessions.append(session)
+        return CachedResponse(b"[]")
+
+    # 没有近期写入：使用传入的副本会话
+    client.portal.call(RedisCache.get_or_load, "post:list:v0:replica-lag-before", load, replica, 60)
+    assert sessions[-1] is replica
+
+    # 失效之后的重建改用主库会话
+    client.portal.call(RedisCache.invalidate, CacheKeys.POST_LIST)
+    client.portal.call(RedisCache.get_or_load, "post:list:v0:replica-lag-after", load, replica, 60)
+    assert sessions[-1] is not replica
+
+
+# 测试配置只读副本时，命中缓存的读请求也不从连接池取出连接
+def test_cached_read_does_not_check_out_connection(client, monkeypatch):
+    # 以主库会话充当副本
+    monkeypatch.setattr(database, "_open_read_session", database._open_session)
+    client.get("/api/tags/")
+
+    checkouts = []
+
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checkouts.append(connection_record)
+
+    target = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    event.listen(target, "checkout", on_checkout)
+    try:
+        response = client.get("/api/tags/")
+    finally:
+        event.remove(target, "checkout", on_checkout)
+    assert response.status_code == 200
+    assert checkouts == []
+
+
+
+# 测试缓存缺失的请求不会拿到后台刷新未取得锁时的空结果
+def test_miss_not_served_empty_background_result(client):
+    cache_key = "post:list:v0:background-lost-lock"
+    fresh = CachedResponse(b'{"fresh":true}')
+
+    async def load(session):
+        return fresh
+
+    async def scenario():
+        # 一次后台刷新正在进行，之后因未取得Redis锁返回None
+        background = asyncio.get_running_loop().create_future()
+        RedisCache._inflight[cache_key] = (background, False)
+        request = asyncio.create_task(RedisCache.get_or_load(cache_key, load, None, 60))
+        await asyncio.sleep(0.05)
+        del RedisCache._inflight[cache_key]
+        background.set_result(None)
+        return await request
+
+    assert client.portal.call(scenario) is fresh
@@ -1,11 +1,14 @@
-from fastapi.testclient import TestClient
-from main import app
-
-# 创建测试客户端
-client = TestClient(app)
+from types import SimpleNamespace
+from sqlalchemy import update
+from tests.test_db import count_queries
+from app.models.post import Post
+from app.models.comment import Comment
+from app.utils.database import SessionLocal, db_session
+from app.utils.post_stats import reconcile_post_stats
+from app.utils.post_index import post_index
 
 # 获取访问令牌
-def get_access_token():
+def get_access_token(client):
     response = client.post(
         "/api/auth/login",
         data={
@@ -16,8 +19,8 @@ def get_access_token():
     return response.json()["access_token"]
 
 # 测试创建评论
-def test_create_comment():
-    token = get_access_token()
+def test_create_comment(client):
+    token = get_access_token(client)
     
     # 先创建一篇文章
     create_post_response = client.post(
@@ -47,8 +50,8 @@ def test_create_comment():
     assert data["post_id"] == post_id
 
 # 测试获取文章评论
-def test_get_comments_by_post():
-    token = get_access_token()
+def test_get_comments_by_post(client):
+    token = get_access_token(client)
     
     # 先创建一篇文章
     create_post_response = client.post(
@@ -79,3 +82,320 @@ def test_get_comments_by_post():
     data = response.json()
     assert isinstance(data, list)
     assert len(data) > 0
+
+# 测试评论列表的查询次数不随条数增长（无N+1）
+def test_get_comments_query_count(client):
+    token = get_access_token(client)
+    create_post_response = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": "Post for Comment Query Count",
+            "content": "This post is for testing comment eager loading",
+            "is_published": True,
+            "tag_ids": []
+        }
+    )
+    post_id = create_post_response.json()["id"]
+    for i in range(5):
+        client.post(
+            "/api/comments/",
+            headers={"Authorization": f"Bearer {token}"},
+            json={
+                "content": f"Query count comment {i}",
+                "post_id": post_id
+            }
+        )
+
+    # 文章存在性检查 + 评论（含作者）
+    with count_queries() as statements:
+        response = client.get(f"/api/comments/post/{post_id}")
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert len(statements) <= 2
+
+# 测试文章评论统计随评论增删更新
+def test_post_comment_stats(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post for Comment Stats",
+            "content": "This post is for testing comment stats",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+    assert client.get(f"/api/posts/{post_id}").json()["comment_count"] == 0
+
+    comment_ids = [
+        client.post(
+            "/api/comments/",
+            headers=headers,
+            json={"content": f"Comment {i}", "post_id": post_id}
+        ).json()["id"]
+        for i in range(2)
+    ]
+    data = client.get(f"/api/posts/{post_id}").json()
+    assert data["comment_count"] == 2
+    assert data["last_commented_at"] is not None
+
+    # 重复删除同一条评论只扣减一次
+    client.delete(f"/api/comments/{comment_ids[0]}", headers=headers)
+    client.delete(f"/api/comments/{comment_ids[0]}", headers=headers)
+    assert client.get(f"/api/posts/{post_id}").json()["comment_count"] == 1
+
+# 测试删除上级评论后，被隐藏的回复也不再计入评论统计
+def test_post_comment_stats_exclude_hidden_replies(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post for Hidden Reply Stats",
+            "content": "This post is for testing stats of hidden replies",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+    parent_id = client.post(
+        "/api/comments/", headers=headers, json={"content": "Parent", "post_id": post_id}
+    ).json()["id"]
+    reply_id = client.post(
+        "/api/comments/", headers=headers, json={"content": "Reply", "post_id": post_id, "parent_id": parent_id}
+    ).json()["id"]
+    client.post("/api/comments/", headers=headers, json={"content": "Nested", "post_id": post_id, "parent_id": reply_id})
+    client.post("/api/comments/", headers=headers, json={"content": "Other", "post_id": post_id})
+    assert client.get(f"/api/posts/{post_id}").json()["comment_count"] == 4
+
+    # 删除上级评论：它和其下的两条回复都不再显示
+    client.delete(f"/api/comments/{parent_id}", headers=headers)
+    assert client.get(f"/api/posts/{post_id}").json()["comment_count"] == 1
+
+    # 回复仍有效但已被隐藏的评论：新回复同样不显示，不计入统计
+    response = client.post(
+        "/api/comments/", headers=headers, json={"content": "Hidden", "post_id": post_id, "parent_id": reply_id}
+    )
+    assert response.status_code == 200
+    assert client.get(f"/api/posts/{post_id}").json()["comment_count"] == 1
+
+    # 校正任务按同样的口径统计，不会改回去
+    async def reconcile():
+        async with db_session() as db:
+            return await reconcile_post_stats(db)
+
+    client.portal.call(reconcile)
+    with SessionLocal() as db:
+        assert db.get(Post, post_id).comment_count == 1
+
+# 测试校正任务修复不一致的评论统计
+def test_reconcile_post_stats(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post for Stats Reconcile",
+            "content": "This post is for testing stats reconciliation",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+    client.post("/api/comments/", headers=headers, json={"content": "Counted comment", "post_id": post_id})
+
+    # 人为制造偏差
+    with SessionLocal() as db:
+        db.execute(update(Post).where(Post.id == post_id).values(comment_count=42))
+        db.commit()
+
+    async def reconcile():
+        async with db_session() as db:
+            return await reconcile_post_stats(db)
+
+    assert client.portal.call(reconcile) >= 1
+    with SessionLocal() as db:
+        assert db.get(Post, post_id).comment_count == 1
+
+# 测试评论串：回复嵌套返回，一条查询取回整棵树，按顶层评论游标分页
+def test_comment_threads(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post for Comment Threads",
+            "content": "This post is for testing threaded comments",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+
+    def comment(content, parent_id=None):
+        response = client.post(
+            "/api/comments/",
+            headers=headers,
+            json={"content": content, "post_id": post_id, "parent_id": parent_id}
+        )
+        assert response.status_code == 200
+        return response.json()["id"]
+
+    first = comment("First thread")
+    reply = comment("Reply", first)
+    nested = comment("Nested reply", reply)
+    second = comment("Second thread")
+
+    # 文章存在性检查 + 递归查询评论树
+    with count_queries() as statements:
+        response = client.get(f"/api/comments/post/{post_id}")
+    assert len(statements) <= 2
+    data = response.json()
+    assert [thread["id"] for thread in data] == [second, first]
+    assert data[1]["replies"][0]["id"] == reply
+    assert data[1]["replies"][0]["replies"][0]["id"] == nested
+    assert data[0]["replies"] == []
+
+    # 按顶层评论分页
+    response = client.get(f"/api/comments/post/{post_id}", params={"limit": 1})
+    assert [thread["id"] for thread in response.json()] == [second]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(f"/api/comments/post/{post_id}", params={"limit": 1, "cursor": cursor})
+    assert [thread["id"] for thread in response.json()] == [first]
+    assert len(response.json()[0]["replies"]) == 1
+
+    # 上级评论必须属于同一篇文章
+    response = client.post(
+        "/api/comments/",
+        headers=headers,
+        json={"content": "Wrong parent", "post_id": post_id, "parent_id": 10 ** 9}
+    )
+    assert response.status_code == 404
+
+# 测试评论串的字段投影：每条评论只返回所选字段，保留嵌套结构
+def test_comment_threads_sparse_fields(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post for Sparse Comment Fields",
+            "content": "This post is for testing comment fields",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+    first = client.post("/api/comments/", headers=headers, json={"content": "Root", "post_id": post_id}).json()["id"]
+    client.post("/api/comments/", headers=headers, json={"content": "Child", "post_id": post_id, "parent_id": first})
+    client.post("/api/comments/", headers=headers, json={"content": "Later root", "post_id": post_id})
+
+    with count_queries() as statements:
+        response = client.get(
+            f"/api/comments/post/{post_id}", params={"limit": 1, "fields": "content,author.username"}
+        )
+    assert response.json() == [{"content": "Later root", "author": {"username": "testuser"}, "replies": []}]
+    assert all("comments.updated_at" not in statement for statement in statements)
+
+    # 投影后的节点不含 created_at 和 id，游标仍可用于翻页
+    response = client.get(
+        f"/api/comments/post/{post_id}",
+        params={"limit": 1, "fields": "content", "cursor": response.headers["X-Next-Cursor"]}
+    )
+    assert response.json() == [{"content": "Root", "replies": [{"content": "Child", "replies": []}]}]
+
+    response = client.get(f"/api/comments/post/{post_id}", params={"fields": "content,votes"})
+    assert response.status_code == 400
+
+# 测试评论接口通过文章存在性索引判断文章是否存在，无需查询文章表
+def test_post_index(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def rebuild():
+        async with db_session() as db:
+            return await post_index.rebuild(db)
+
+    client.portal.call(rebuild)
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post for Existence Index",
+            "content": "This post is for testing the post existence index",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+    assert client.portal.call(post_index.contains, post_id) is True
+
+    # 缓存未命中只查询评论树，命中时不访问数据库
+    with count_queries() as statements:
+        assert client.get(f"/api/comments/post/{post_id}").status_code == 200
+    assert len(statements) == 1
+    with count_queries() as statements:
+        assert client.get(f"/api/comments/post/{post_id}").status_code == 200
+    assert statements == []
+
+    # 不存在的文章直接返回404
+    with count_queries() as statements:
+        assert client.get("/api/comments/post/999999").status_code == 404
+    assert statements == []
+
+    # 删除文章后索引与评论缓存同步失效
+    client.delete(f"/api/posts/{post_id}", headers=headers)
+    assert client.portal.call(post_index.contains, post_id) is False
+    assert client.get(f"/api/comments/post/{post_id}").status_code == 404
+    response = client.post("/api/comments/", headers=headers, json={"content": "Too late", "post_id": post_id})
+    assert response.status_code == 404
+
+# 测试重建位图期间删除的文章，在替换位图后被清除
+def test_post_index_rebuild_clears_posts_deleted_during_build(client):
+    deleted_id = 10 ** 6
+
+    async def rebuild():
+        async with db_session() as db:
+            calls = []
+
+            async def scalars(statement):
+                # 第一次查询（构建快照）时该文章仍存在，之后已被删除
+                ids = (await db.scalars(statement)).all()
+                calls.append(statement)
+                return SimpleNamespace(all=lambda: ids + [deleted_id] if len(calls) == 1 else ids)
+
+            return await post_index.rebuild(SimpleNamespace(scalars=scalars))
+
+    client.portal.call(rebuild)
+    assert client.portal.call(post_index.contains, deleted_id) is False
+
+# 测试删除带有嵌套回复的文章，评论随文章一并删除
+def test_delete_post_with_replies(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post with Replies to Delete",
+            "content": "This post is for testing deleting a post with threaded comments",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+    parent_id = client.post(
+        "/api/comments/", headers=headers, json={"content": "Parent", "post_id": post_id}
+    ).json()["id"]
+    reply_id = client.post(
+        "/api/comments/", headers=headers, json={"content": "Reply", "post_id": post_id, "parent_id": parent_id}
+    ).json()["id"]
+    client.post("/api/comments/", headers=headers, json={"content": "Nested", "post_id": post_id, "parent_id": reply_id})
+
+    response = client.delete(f"/api/posts/{post_id}", headers=headers)
+    assert response.status_code == 204
+    assert client.get(f"/api/posts/{post_id}").status_code == 404
+    with SessionLocal() as db:
+        assert db.query(Comment).filter(Comment.post_id == post_id).count() == 0
+
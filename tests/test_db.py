@@ -1,5 +1,7 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from app.utils import database
 from app.utils.database import Base
 
 # 使用内存数据库进行测试
@@ -26,3 +28,20 @@ def init_test_db():
 # 清理测试数据库
 def clear_test_db():
     Base.metadata.drop_all(bind=engine)
+
+
+# 统计代码块内应用数据库执行的SQL语句
+@contextmanager
+def count_queries():
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # 异步模式下监听异步引擎底层的同步引擎
+    target = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(target, "before_cursor_execute", before_cursor_execute)
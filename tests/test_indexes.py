@@ -0,0 +1,107 @@
+import json
+import uuid
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app.models.tag import Tag
+from app.utils import database
+from app.utils.database import SessionLocal
+
+# 执行计划只在PostgreSQL上有意义
+pytestmark = pytest.mark.skipif(
+    database.engine.dialect.name != "postgresql", reason="EXPLAIN checks require PostgreSQL"
+)
+
+# 热点查询涉及的大表，不允许出现顺序扫描
+HOT_TABLES = {"posts", "comments", "post_tags"}
+
+# 获取访问令牌
+def get_access_token(client):
+    response = client.post(
+        "/api/auth/login",
+        data={
+            "username": "testuser",
+            "password": "testpassword"
+        }
+    )
+    return response.json()["access_token"]
+
+
+# 对代码块内应用执行的每条查询先执行 EXPLAIN，收集执行计划；
+# 关闭 enable_seqscan 后，只有没有可用索引时规划器才会选择顺序扫描
+@contextmanager
+def explain_queries():
+    plans = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE")):
+            return
+        cursor.execute("SET enable_seqscan = off")
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+        plan = cursor.fetchone()[0]
+        cursor.execute("RESET enable_seqscan")
+        plans.append((statement, json.loads(plan) if isinstance(plan, str) else plan))
+
+    target = database.async_engine.sync_engine if database.async_engine is not None else database.engine
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield plans
+    finally:
+        event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+
+def seq_scans(node):
+    """执行计划中对热点表的顺序扫描"""
+    if node.get("Node Type") == "Seq Scan" and node.get("Relation Name") in HOT_TABLES:
+        yield node["Relation Name"]
+    for child in node.get("Plans", []):
+        yield from seq_scans(child)
+
+
+# 测试热点接口的查询都能走索引
+def test_hot_queries_use_indexes(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    # 创建标签需要管理员权限，直接写入数据库
+    with SessionLocal() as db:
+        tag = Tag(name=f"index-check-{uuid.uuid4().hex[:8]}")
+        db.add(tag)
+        db.commit()
+        tag_id = tag.id
+    post_ids = [
+        client.post(
+            "/api/posts/",
+            headers=headers,
+            json={
+                "title": f"Indexed post {i}",
+                "content": "This post is for testing query plans",
+                "is_published": i != 0,
+                "tag_ids": [tag_id]
+            }
+        ).json()["id"]
+        for i in range(3)
+    ]
+    post_id = post_ids[-1]
+    comment_id = client.post(
+        "/api/comments/", headers=headers, json={"content": "Indexed comment", "post_id": post_id}
+    ).json()["id"]
+
+    # 新建已发布文章后列表缓存已失效，以下请求都会查询数据库
+    with explain_queries() as plans:
+        response = client.get("/api/posts/", params={"limit": 2})
+        client.get("/api/posts/", params={"limit": 2, "cursor": response.headers["X-Next-Cursor"]})
+        client.get("/api/posts/", params={"limit": 3, "tag_id": tag_id})
+        client.get("/api/posts/me", headers=headers, params={"limit": 3})
+        client.get("/api/posts/search", params={"q": "Indexed", "limit": 3})
+        client.get(f"/api/posts/{post_ids[0]}", headers=headers)
+        client.post(
+            "/api/comments/",
+            headers=headers,
+            json={"content": "Indexed reply", "post_id": post_id, "parent_id": comment_id}
+        )
+        client.get(f"/api/comments/post/{post_id}", params={"limit": 3})
+        client.delete(f"/api/comments/{comment_id}", headers=headers)
+
+    assert plans
+    for statement, plan in plans:
+        assert not list(seq_scans(plan[0]["Plan"])), f"Sequential scan in:\n{statement}"
@@ -0,0 +1,37 @@
+import json
+import logging
+from app.utils.logger import JsonFormatter, RepeatSampler, StructuredQueueHandler
+
+def make_record(msg, *args, exc_info=None):
+    return logging.LogRecord("app.utils.redis", logging.WARNING, __file__, 1, msg, args, exc_info)
+
+# 测试重复日志在窗口内只放行前几条，窗口结束后报告丢弃条数
+def test_repeat_sampler():
+    now = [0.0]
+    sampler = RepeatSampler(window=60, burst=2, clock=lambda: now[0])
+    results = [sampler.filter(make_record("Redis get error: %s", f"timeout {i}")) for i in range(5)]
+    assert results == [True, True, False, False, False]
+    # 其他来源的日志不受影响
+    assert sampler.filter(make_record("Redis set error: %s", "timeout"))
+
+    now[0] = 61.0
+    record = make_record("Redis get error: %s", "timeout")
+    assert sampler.filter(record)
+    assert record.suppressed == 3
+
+# 测试JSON格式：入队时展开参数和异常堆栈，额外字段原样输出
+def test_json_log_record():
+    try:
+        raise ValueError("boom")
+    except ValueError as e:
+        record = make_record("Unhandled exception: %s", e, exc_info=(type(e), e, e.__traceback__))
+    record.suppressed = 2
+    prepared = StructuredQueueHandler(None).prepare(record)
+    assert prepared.exc_info is None
+
+    data = json.loads(JsonFormatter().format(prepared))
+    assert data["level"] == "WARNING"
+    assert data["logger"] == "app.utils.redis"
+    assert data["message"] == "Unhandled exception: boom"
+    assert "ValueError: boom" in data["exception"]
+    assert data["suppressed"] == 2
@@ -0,0 +1,39 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.utils.metrics import MetricsMiddleware, instrument_engine, metrics
+from app.utils.redis import CacheKeys
+
+# 测试指标中间件按路由模板统计请求耗时与SQL条数
+def test_metrics_middleware():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    # 同步处理函数在线程池中执行，SQL仍计入当前请求
+    @app.get("/metered/{item_id}")
+    def read_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        return {"id": item_id}
+
+    with TestClient(app) as client:
+        client.get("/metered/1")
+        client.get("/metered/2")
+        client.get("/metered-missing")
+
+    output = metrics.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/metered/{item_id}",status="200"} 2' in output
+    assert 'db_queries_total{method="GET",route="/metered/{item_id}"} 4' in output
+    assert 'http_request_db_queries_bucket{method="GET",route="/metered/{item_id}",le="2"} 2' in output
+    assert 'route="unmatched",status="404"' in output
+
+# 测试缓存命中按命名空间统计，不含文章ID等高基数部分
+def test_cache_key_namespaces():
+    assert CacheKeys.namespace_of(CacheKeys.post_list(3, 0, 10)) == CacheKeys.POST_LIST
+    assert CacheKeys.namespace_of(CacheKeys.post_detail(42)) == "post:detail"
+    assert CacheKeys.namespace_of(CacheKeys.comments(1, 42, 0, 50)) == "comments"
+    assert CacheKeys.namespace_of(CacheKeys.principal("alice", 2, "jti")) == "principal"
+    assert CacheKeys.namespace_of(CacheKeys.tag_cloud(1)) == CacheKeys.TAG_LIST
@@ -1,11 +1,14 @@
-from fastapi.testclient import TestClient
-from main import app
-
-# 创建测试客户端
-client = TestClient(app)
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from tests.test_db import count_queries
+from app.models.tag import Tag
+from app.utils.database import SessionLocal
+from app.utils.redis import RedisCache, CacheKeys
+from app.utils.serializers import CachedResponse
 
 # 获取访问令牌
-def get_access_token():
+def get_access_token(client):
     response = client.post(
         "/api/auth/login",
         data={
@@ -16,8 +19,8 @@ def get_access_token():
     return response.json()["access_token"]
 
 # 测试创建文章
-def test_create_post():
-    token = get_access_token()
+def test_create_post(client):
+    token = get_access_token(client)
     response = client.post(
         "/api/posts/",
         headers={"Authorization": f"Bearer {token}"},
@@ -36,16 +39,16 @@ def test_create_post():
     assert data["is_published"] == True
 
 # 测试获取文章列表
-def test_get_posts():
+def test_get_posts(client):
     response = client.get("/api/posts/")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
 
 # 测试获取文章详情
-def test_get_post():
+def test_get_post(client):
     # 先创建一篇文章
-    token = get_access_token()
+    token = get_access_token(client)
     create_response = client.post(
         "/api/posts/",
         headers={"Authorization": f"Bearer {token}"},
@@ -64,3 +67,392 @@ def test_get_post():
     data = response.json()
     assert data["id"] == post_id
     assert data["title"] == "Test Post for Detail"
+
+# 测试游标分页
+def test_get_posts_cursor_pagination(client):
+    token = get_access_token(client)
+    for i in range(3):
+        client.post(
+            "/api/posts/",
+            headers={"Authorization": f"Bearer {token}"},
+            json={
+                "title": f"Cursor Post {i}",
+                "content": "This is a test post for cursor pagination",
+                "is_published": True,
+                "tag_ids": []
+            }
+        )
+
+    # 第一页
+    first_page = client.get("/api/posts/", params={"limit": 2})
+    assert first_page.status_code == 200
+    cursor = first_page.headers.get("X-Next-Cursor")
+    assert cursor
+
+    # 根据游标获取下一页，不应与第一页重叠
+    second_page = client.get("/api/posts/", params={"limit": 2, "cursor": cursor})
+    assert second_page.status_code == 200
+    first_ids = {post["id"] for post in first_page.json()}
+    second_ids = {post["id"] for post in second_page.json()}
+    assert second_ids
+    assert not first_ids & second_ids
+    assert max(second_ids) < min(first_ids)
+
+# 测试无效游标
+def test_get_posts_invalid_cursor(client):
+    response = client.get("/api/posts/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+# 测试文章列表的查询次数不随条数增长（无N+1）
+def test_get_posts_query_count(client):
+    token = get_access_token(client)
+    keyword = f"eager{uuid.uuid4().hex}"
+    for i in range(5):
+        client.post(
+            "/api/posts/",
+            headers={"Authorization": f"Bearer {token}"},
+            json={
+                "title": f"{keyword} {i}",
+                "content": "This is a test post for eager loading",
+                "is_published": True,
+                "tag_ids": []
+            }
+        )
+
+    # 使用唯一的搜索词保证缓存未命中：文章（含作者）+ 标签
+    with count_queries() as statements:
+        response = client.get("/api/posts/", params={"search": keyword, "limit": 5})
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert len(statements) <= 2
+
+    # 当前用户 + 文章（含作者）+ 标签
+    with count_queries() as statements:
+        response = client.get("/api/posts/me", headers={"Authorization": f"Bearer {token}"}, params={"limit": 5})
+    assert response.status_code == 200
+    assert len(response.json()) == 5
+    assert len(statements) <= 3
+
+# 测试全文检索
+def test_search_posts(client):
+    token = get_access_token(client)
+    keyword = f"fts{uuid.uuid4().hex}"
+    create_response = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": f"Searchable {keyword}",
+            "content": f"The body mentions {keyword} once <script>alert(1)</script>",
+            "is_published": True,
+            "tag_ids": []
+        }
+    )
+    post_id = create_response.json()["id"]
+
+    response = client.get("/api/posts/search", params={"q": keyword})
+    assert response.status_code == 200
+    data = response.json()
+    assert [post["id"] for post in data] == [post_id]
+    assert data[0]["rank"] > 0
+    assert f"<mark>{keyword}</mark>" in data[0]["snippet"]
+    # 正文中的HTML已转义，片段中只有 <mark> 是标记
+    assert "<script>" not in data[0]["snippet"]
+    assert "&lt;script&gt;" in data[0]["snippet"]
+
+# 测试含中日韩文字的检索按子串匹配
+def test_search_posts_cjk(client):
+    token = get_access_token(client)
+    keyword = f"检索{uuid.uuid4().hex[:8]}"
+    create_response = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": "中文文章",
+            "content": f"这篇文章介绍{keyword}的用法<b>加粗</b>",
+            "is_published": True,
+            "tag_ids": []
+        }
+    )
+    post_id = create_response.json()["id"]
+
+    response = client.get("/api/posts/search", params={"q": keyword})
+    assert response.status_code == 200
+    data = response.json()
+    assert [post["id"] for post in data] == [post_id]
+    assert data[0]["rank"] > 0
+    assert data[0]["snippet"] == f"这篇文章介绍<mark>{keyword}</mark>的用法&lt;b&gt;加粗&lt;/b&gt;"
+
+    # 列表的 search 参数使用同一匹配方式
+    response = client.get("/api/posts/", params={"search": keyword})
+    assert [post["id"] for post in response.json()] == [post_id]
+
+# 测试创建文章后列表缓存失效
+def test_get_posts_cache_invalidated_on_create(client):
+    token = get_access_token(client)
+    # 预热列表缓存
+    client.get("/api/posts/", params={"limit": 1})
+
+    create_response = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": "Test Post for Invalidation",
+            "content": "This post should show up on the cached first page",
+            "is_published": True,
+            "tag_ids": []
+        }
+    )
+    post_id = create_response.json()["id"]
+
+    response = client.get("/api/posts/", params={"limit": 1})
+    assert response.status_code == 200
+    assert response.json()[0]["id"] == post_id
+
+# 测试缓存命中统计
+def test_cache_stats(client):
+    client.get("/api/posts/", params={"limit": 3})
+    client.get("/api/posts/", params={"limit": 3})
+    response = client.get("/health/cache")
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data) == {"l1", "l2"}
+    assert data["l1"]["hits"] + data["l2"]["hits"] > 0
+
+# 测试完整视图的列表页顺带预热文章详情缓存
+def test_get_posts_warms_post_detail_cache(client):
+    token = get_access_token(client)
+    create_response = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": "Test Post for Detail Warming",
+            "content": "This post detail should be cached by the list page",
+            "is_published": True,
+            "tag_ids": []
+        }
+    )
+    post_id = create_response.json()["id"]
+
+    list_response = client.get("/api/posts/", params={"limit": 5, "view": "full"})
+    assert list_response.json()[0]["id"] == post_id
+
+    # 详情直接命中缓存，不再查询数据库
+    with count_queries() as statements:
+        response = client.get(f"/api/posts/{post_id}")
+    assert response.status_code == 200
+    assert response.json() == list_response.json()[0]
+    assert statements == []
+
+# 测试完整视图的列表页复用已缓存的文章详情，只查询本页的文章id
+def test_get_posts_full_view_reuses_cached_details(client):
+    token = get_access_token(client)
+    for i in range(3):
+        client.post(
+            "/api/posts/",
+            headers={"Authorization": f"Bearer {token}"},
+            json={
+                "title": f"Test Post for Detail Reuse {i}",
+                "content": "This post detail should be read back from the cache",
+                "is_published": True,
+                "tag_ids": []
+            }
+        )
+
+    # 预热本页文章的详情缓存
+    warm_response = client.get("/api/posts/", params={"limit": 3, "view": "full"})
+
+    # 另一个未缓存的分页：本页文章的详情一次取回，不再加载文章
+    with count_queries() as statements:
+        response = client.get("/api/posts/", params={"limit": 2, "view": "full"})
+    assert response.json() == warm_response.json()[:2]
+    assert len(statements) == 1
+
+# 测试默认的精简列表不含正文和作者的私有字段，也不读取正文列
+def test_get_posts_compact_view(client):
+    token = get_access_token(client)
+    post_id = client.post(
+        "/api/posts/",
+        headers={"Authorization": f"Bearer {token}"},
+        json={
+            "title": "Test Post for Compact List",
+            "content": "Long form body " * 1000,
+            "summary": "Short summary",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+
+    with count_queries() as statements:
+        compact = client.get("/api/posts/", params={"limit": 1})
+    item = compact.json()[0]
+    assert item["id"] == post_id
+    assert item["summary"] == "Short summary"
+    assert "content" not in item
+    assert set(item["author"]) == {"id", "username", "full_name"}
+    assert "posts.content" not in statements[0]
+
+    # 完整视图单独缓存，包含正文
+    full = client.get("/api/posts/", params={"limit": 1, "view": "full"})
+    assert full.json()[0]["content"] == "Long form body " * 1000
+    assert len(compact.content) * 10 < len(full.content)
+
+# 测试 fields 参数只查询并返回所选字段，不同写法的同一投影共用缓存
+def test_get_posts_sparse_fields(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Test Post for Sparse Fields",
+            "content": "Body that sparse fields never read",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+
+    with count_queries() as statements:
+        response = client.get("/api/posts/", params={"limit": 2, "fields": "id,title,author.username"})
+    assert response.status_code == 200
+    item = response.json()[0]
+    assert item == {"id": post_id, "title": "Test Post for Sparse Fields", "author": {"username": "testuser"}}
+    # 只读取所选的列，不查询标签
+    assert len(statements) == 1
+    assert "posts.content" not in statements[0]
+    assert "users_1.email" not in statements[0]
+    assert "X-Next-Cursor" in response.headers
+
+    # 字段顺序和重复不影响缓存键
+    with count_queries() as statements:
+        again = client.get("/api/posts/", params={"limit": 2, "fields": "author.username, title,id,title"})
+    assert statements == []
+    assert again.json() == response.json()
+
+    # 文章详情同样支持字段投影，更新文章后投影缓存一并失效
+    response = client.get(f"/api/posts/{post_id}", params={"fields": "title,comment_count"})
+    assert response.json() == {"title": "Test Post for Sparse Fields", "comment_count": 0}
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"title": "Renamed Sparse Post"})
+    response = client.get(f"/api/posts/{post_id}", params={"fields": "title,comment_count"})
+    assert response.json() == {"title": "Renamed Sparse Post", "comment_count": 0}
+
+    # 未知字段返回400
+    response = client.get("/api/posts/", params={"fields": "id,password_hash"})
+    assert response.status_code == 400
+    response = client.get(f"/api/posts/{post_id}", params={"fields": "author.password_hash"})
+    assert response.status_code == 400
+
+# 测试条件请求：内容未变化时返回304，不查询数据库也不返回响应体
+def test_get_post_conditional_requests(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Test Post for Conditional GET",
+            "content": "This post is for testing ETags",
+            "is_published": True,
+            "tag_ids": []
+        }
+    ).json()["id"]
+
+    response = client.get(f"/api/posts/{post_id}")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"].startswith("public")
+
+    with count_queries() as statements:
+        response = client.get(f"/api/posts/{post_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+    assert statements == []
+
+    # 不带 If-None-Match 时按 Last-Modified 判断：生成时间所在的秒早于 If-Modified-Since 才返回304
+    last_modified = client.get(f"/api/posts/{post_id}").headers["Last-Modified"]
+    later = formatdate(parsedate_to_datetime(last_modified).timestamp() + 1, usegmt=True)
+    response = client.get(f"/api/posts/{post_id}", headers={"If-Modified-Since": later})
+    assert response.status_code == 304
+    response = client.get(f"/api/posts/{post_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+
+    # 内容变化后ETag随之变化
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"title": "Changed Conditional Post"})
+    response = client.get(f"/api/posts/{post_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    # 同一秒内修改并重新生成，Last-Modified 不变，也不能按旧值返回304
+    response = client.get(f"/api/posts/{post_id}", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert response.json()["title"] == "Changed Conditional Post"
+
+    # 列表同样支持条件请求
+    response = client.get("/api/posts/", params={"limit": 1})
+    response = client.get("/api/posts/", params={"limit": 1}, headers={"If-None-Match": response.headers["ETag"]})
+    assert response.status_code == 304
+    assert "X-Next-Cursor" in response.headers
+
+
+# 测试更新文章只清除包含它的列表页，草稿的更新不清除任何列表
+def test_update_post_invalidates_affected_pages(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    with SessionLocal() as db:
+        tag = Tag(name=f"pages-{uuid.uuid4().hex[:8]}")
+        db.add(tag)
+        db.commit()
+        tag_id = tag.id
+
+    def create(title, is_published=True):
+        return client.post(
+            "/api/posts/",
+            headers=headers,
+            json={"title": title, "content": "Reverse index test", "is_published": is_published, "tag_ids": []}
+        ).json()["id"]
+
+    older = create("Older Indexed Post")
+    create("Newer Indexed Post")
+    draft = create("Draft Indexed Post", is_published=False)
+
+    first_page = {"limit": 1}
+    second_page = {"skip": 1, "limit": 1}
+    tag_page = {"limit": 5, "tag_id": tag_id}
+    for params in (first_page, second_page, tag_page):
+        client.get("/api/posts/", params=params)
+    assert client.get("/api/posts/", params=tag_page).json() == []
+
+    # 更新草稿不影响任何列表缓存
+    client.put(f"/api/posts/{draft}", headers=headers, json={"title": "Edited Draft"})
+    with count_queries() as statements:
+        for params in (first_page, second_page, tag_page):
+            client.get("/api/posts/", params=params)
+    assert statements == []
+
+    # 更新已发布文章：只有包含它的页和新增标签的筛选页重新查询
+    client.put(f"/api/posts/{older}", headers=headers, json={"title": "Edited Older Post", "tag_ids": [tag_id]})
+    with count_queries() as statements:
+        client.get("/api/posts/", params=first_page)
+    assert statements == []
+    assert client.get("/api/posts/", params=second_page).json()[0]["title"] == "Edited Older Post"
+    assert [post["id"] for post in client.get("/api/posts/", params=tag_page).json()] == [older]
+
+
+# 测试重建期间引用的对象发生变化时，重建结果不写入缓存
+def test_referenced_entry_skipped_after_concurrent_change(client):
+    ref = CacheKeys.post_ref(10 ** 9)
+    started = time.time()
+    client.portal.call(RedisCache.invalidate_references, [ref])
+    stale = CachedResponse(b"[]", references=[ref])
+    assert not client.portal.call(RedisCache.set_response, "post:list:v0:reference-test", stale, 60, started)
+    assert client.portal.call(RedisCache.get_response, "post:list:v0:reference-test") is None
+
+
+# 测试列表页预热详情期间文章发生变化时，预热的详情不写入缓存
+def test_warmed_detail_skipped_after_concurrent_change(client):
+    ref = CacheKeys.post_ref(10 ** 9 + 1)
+    detail_key = CacheKeys.post_detail(10 ** 9 + 1)
+    started = time.time()
+    client.portal.call(RedisCache.invalidate_references, [ref])
+    warmed = {detail_key: CachedResponse(b"{}", references=[ref])}
+    client.portal.call(RedisCache.set_many_responses, warmed, 60, 0, started)
+    assert client.portal.call(RedisCache.get_response, detail_key) is None
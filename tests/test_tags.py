@@ -1,11 +1,9 @@
-from fastapi.testclient import TestClient
-from main import app
-
-# 创建测试客户端
-client = TestClient(app)
+import uuid
+from app.models.tag import Tag
+from app.utils.database import SessionLocal
 
 # 获取访问令牌
-def get_access_token():
+def get_access_token(client):
     response = client.post(
         "/api/auth/login",
         data={
@@ -16,8 +14,84 @@ def get_access_token():
     return response.json()["access_token"]
 
 # 测试获取标签列表
-def test_get_tags():
+def test_get_tags(client):
     response = client.get("/api/tags/")
     assert response.status_code == 200
     data = response.json()
     assert isinstance(data, list)
+
+# 创建标签需要管理员权限，测试中直接写入数据库
+def create_tags(count):
+    with SessionLocal() as db:
+        tags = [Tag(name=f"tag-{uuid.uuid4().hex[:8]}") for _ in range(count)]
+        db.add_all(tags)
+        db.commit()
+        return [tag.id for tag in tags]
+
+# 测试标签列表按页缓存，不同分页返回不同结果
+def test_get_tags_pagination(client):
+    create_tags(3)
+    first = client.get("/api/tags/", params={"limit": 2}).json()
+    second = client.get("/api/tags/", params={"skip": 2, "limit": 2}).json()
+    assert len(first) == 2
+    assert {tag["id"] for tag in first}.isdisjoint(tag["id"] for tag in second)
+    # 再次请求命中缓存，结果不变
+    assert client.get("/api/tags/", params={"skip": 2, "limit": 2}).json() == second
+
+# 测试标签列表的条件请求
+def test_get_tags_not_modified(client):
+    create_tags(1)
+    response = client.get("/api/tags/")
+    assert "max-age" in response.headers["Cache-Control"]
+    response = client.get("/api/tags/", headers={"If-None-Match": f'W/{response.headers["ETag"]}, "other"'})
+    assert response.status_code == 304
+    assert response.content == b""
+
+# 测试标签云的文章数随文章的标签与发布状态增量更新
+def test_tag_cloud_counts(client):
+    token = get_access_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    first_tag, second_tag = create_tags(2)
+
+    def counts():
+        cloud = client.get("/api/tags/cloud").json()
+        return {tag["id"]: tag["post_count"] for tag in cloud}
+
+    post_id = client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Post for Tag Cloud",
+            "content": "This post is for testing tag counts",
+            "is_published": True,
+            "tag_ids": [first_tag, second_tag]
+        }
+    ).json()["id"]
+    # 未发布文章不计入
+    client.post(
+        "/api/posts/",
+        headers=headers,
+        json={
+            "title": "Draft for Tag Cloud",
+            "content": "This draft should not be counted",
+            "is_published": False,
+            "tag_ids": [first_tag]
+        }
+    )
+    assert counts()[first_tag] == 1
+    assert counts()[second_tag] == 1
+
+    # 移除一个标签
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"tag_ids": [first_tag]})
+    assert counts()[first_tag] == 1
+    assert second_tag not in counts()
+
+    # 取消发布后不再计入
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"is_published": False, "tag_ids": [first_tag]})
+    assert first_tag not in counts()
+
+    # 重新发布后删除文章
+    client.put(f"/api/posts/{post_id}", headers=headers, json={"is_published": True, "tag_ids": [first_tag]})
+    assert counts()[first_tag] == 1
+    client.delete(f"/api/posts/{post_id}", headers=headers)
+    assert first_tag not in counts()